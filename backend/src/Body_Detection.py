@@ -5,14 +5,21 @@ import math
 import numpy as np
 import json
 from datetime import datetime
-import sqlite3
 import os
 
+from storage import MeasurementStore
+from video_source import open_source
+
+# CAMERA_SOURCE picks the input (webcam index, video file, image directory or "synthetic");
+# HEADLESS=1 skips the preview window so the loop runs on a box without a display
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', 0)
+HEADLESS = os.environ.get('HEADLESS') == '1'
+
 # Initialize MediaPipe
 mpPose = mp.solutions.pose
 mpDraw = mp.solutions.drawing_utils
 pose = mpPose.Pose()
-capture = cv.VideoCapture(0)
+capture = open_source(CAMERA_SOURCE)
 
 def calculate_distance(p1, p2):
     return math.sqrt((p2[0] - p1[0]) ** 2 + (p2[1] - p1[1]) ** 2)
@@ -23,35 +30,11 @@ def estimate_circumference(width):
     return width * 2.5
 
 def init_database():
-    db_path = 'measurements.db'
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS measurements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            height REAL,
-            shoulder_width REAL,
-            chest_circumference REAL,
-            waist_circumference REAL
-        )
-    ''')
-    conn.commit()
-    return conn
-
-def save_measurements_to_db(conn, measurements):
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO measurements (timestamp, height, shoulder_width, chest_circumference, waist_circumference)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (
-        measurements["timestamp"],
-        measurements["height"],
-        measurements["shoulder_width"],
-        measurements["chest_circumference"],
-        measurements["waist_circumference"]
-    ))
-    conn.commit()
+    # Creates or migrates the schema (WAL mode, timestamp index)
+    return MeasurementStore('measurements.db')
+
+def save_measurements_to_db(store, measurements):
+    store.insert(measurements)
 
 # Faktor kalibrasi untuk konversi pixel ke cm
 PIXEL_TO_CM = 0.264
@@ -67,7 +50,7 @@ current_measurements = {
 }
 
 # Initialize database
-db_conn = init_database()
+store = init_database()
 
 # Initialize countdown variables
 start_time = time.time()
@@ -79,6 +62,8 @@ print("Tekan Q untuk keluar")
 
 while True:
     isTrue, img = capture.read()
+    if not isTrue:
+        break
     img_rgb = cv.cvtColor(img, cv.COLOR_BGR2RGB)
     result = pose.process(img_rgb)
 
@@ -154,7 +139,7 @@ while True:
     elif not measurements_captured:
         # Capture measurements
         current_measurements["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        save_measurements_to_db(db_conn, current_measurements)
+        save_measurements_to_db(store, current_measurements)
         print(f"\nPengukuran berhasil disimpan ke database")
         print(f"Hasil Pengukuran:")
         print(f"Tinggi: {current_measurements['height']} cm")
@@ -174,11 +159,13 @@ while True:
     ptime = ctime
     cv.putText(img, "FPS : ", (40, 30), cv.FONT_HERSHEY_PLAIN, 2, (0, 0, 0), 2)
     cv.putText(img, str(int(fps)), (160, 30), cv.FONT_HERSHEY_PLAIN, 2, (0, 0, 0), 2)
+    if HEADLESS:
+        continue
     cv.imshow("Body Measurement", img)
 
     if cv.waitKey(1) & 0xFF == ord('q'):
         break
 
-db_conn.close()
+store.close()
 capture.release()
 cv.destroyAllWindows()
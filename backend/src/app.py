@@ -1,9 +1,6 @@
-from flask import Flask, render_template, Response, redirect, url_for, jsonify, request, flash, send_file
+from flask import Flask, render_template, Response, redirect, url_for, jsonify, request, flash, send_file, session
 from flask_socketio import SocketIO, emit
 from flask_mail import Mail, Message
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
 from io import BytesIO
 import cv2
 import mediapipe as mp
@@ -14,17 +11,33 @@ import os
 import threading
 import pyttsx3
 import sys
-import sqlite3
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-import tempfile
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 
+from frame_pipeline import FramePipeline, mjpeg_chunk
+from camera_broker import camera_broker, stream_hub
+from measurement_session import PosePool, SessionManager
+from pose_service import PoseService
+from face_tracking import AdaptiveFaceDetector
+from calibration import CalibrationCache
+from face_measurement import (BLACK, GREEN, RED, Known_distance, Known_width, compute_focal_length,
+                              distance_status, face_detector, face_distance, find_reference_image)
+from stream_encoder import StreamEncoder
+from remote_capture import RemoteCaptureHub, RemoteClient
+from stream_socket import StreamSocketHub
+from session_events import SessionEvents
+from measurement_report import ReportCache
+from storage import MeasurementStore, parse_page_args
+from query_cache import QueryCache
+from metrics import registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, DB_INSERT_SECONDS, MEASUREMENTS_CAPTURED, JOBS
+from quality_governor import QualityGovernor, scale_to_width
+from body_measurement import (get_body_measurements, height_keypoints, landmarks_to_array, measure_height,
+                              measurement_confidence)
+
 # Load environment variables
 load_dotenv()
 
@@ -62,58 +75,62 @@ DB_PATH = os.path.join(BASE_DIR, 'measurements.db')
 print(f"Using database at: {DB_PATH}")  # Debug print to verify path
 
 # Database functions
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Pooled WAL connections; the schema is migrated here, once per start
+store = MeasurementStore(DB_PATH)
+# Reads come from memory until an insert; keys carry the change counter, so writes
+# by other processes (view_measurements.py) are picked up without waiting for the TTL
+measurement_cache = QueryCache(float(os.environ.get('MEASUREMENT_CACHE_TTL', 5)))
 
 def get_all_measurements():
-    conn = get_db_connection()
-    measurements = conn.execute('SELECT * FROM measurements ORDER BY timestamp DESC').fetchall()
-    conn.close()
-    return [dict(row) for row in measurements]
+    return measurement_cache.get(('all', store.version()[0]), store.all)
 
 def get_latest_measurement():
-    conn = get_db_connection()
-    measurement = conn.execute('SELECT * FROM measurements ORDER BY timestamp DESC LIMIT 1').fetchone()
-    conn.close()
-    return dict(measurement) if measurement else None
+    return measurement_cache.get(('latest', store.version()[0]), store.latest)
+
+def get_measurements_page(**options):
+    key = ('page', store.version()[0], repr(sorted(options.items())))
+    return measurement_cache.get(key, lambda: store.page(**options))
+
+def get_measurements_version():
+    return store.version()
+
+def save_measurement(measurement_data):
+    row_id = store.insert(measurement_data)
+    measurement_cache.invalidate()
+    return row_id
 
 # Global variables
-camera = None
-cascade_path = os.path.join(os.path.dirname(BASE_DIR), "config", "haarcascade_frontalface_default.xml")
-print(f"Loading cascade classifier from: {cascade_path}")  # Debug print
-
-if not os.path.exists(cascade_path):
-    raise FileNotFoundError(f"Cascade classifier file not found at: {cascade_path}")
-
-face_detector = cv2.CascadeClassifier(cascade_path)
-if face_detector.empty():
-    raise ValueError("Error loading cascade classifier")
-
-button_clicked = False
-is_measuring_height = False
-
-# Constants for face detection
-Known_distance = 230  # centimeter
-Known_width = 14.3    # centimeter
-GREEN = (0, 255, 0)
-RED = (0, 0, 255)
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-BLUE = (255, 0, 0)
-
-# Calibration factors for body measurements
-HEIGHT_CALIBRATION_FACTOR = 0.48
-SHOULDER_CALIBRATION_FACTOR = 1
-CHEST_CIRCUMFERENCE_FACTOR = 1.2
-WAIST_CIRCUMFERENCE_FACTOR = 1.7
-HIP_CIRCUMFERENCE_FACTOR = 2.5
+# Webcam index, video file, image directory or "synthetic" (see video_source.open_source)
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', os.environ.get('CAMERA_INDEX', '0'))
+if CAMERA_SOURCE.isdigit():
+    CAMERA_SOURCE = int(CAMERA_SOURCE)
+# Focal lengths keyed by reference image hash, camera and resolution
+calibration_cache = CalibrationCache(os.environ.get('CALIBRATION_CACHE', os.path.join(BASE_DIR, 'calibration_cache.json')))
+
+# MJPEG stream encoding - lower quality/width saves bandwidth on congested networks
+STREAM_JPEG_QUALITY = int(os.environ.get('STREAM_JPEG_QUALITY', 80))
+STREAM_MAX_WIDTH = int(os.environ.get('STREAM_MAX_WIDTH', 0))  # 0 keeps the frame size
+
+def create_stream_encoder(name):
+    return StreamEncoder(quality=STREAM_JPEG_QUALITY, max_width=STREAM_MAX_WIDTH, name=name)
+
+# Body streams lower pose input resolution / model complexity when they fall below this
+TARGET_FPS = float(os.environ.get('TARGET_FPS', 15))
 
 # MediaPipe setup for body detection
 mpPose = mp.solutions.pose
 mpDraw = mp.solutions.drawing_utils
-pose = mpPose.Pose()
+pose_pool = PosePool(int(os.environ.get('POSE_POOL_SIZE', 0)) or None)  # Defaults to one per CPU core
+# POSE_WORKERS > 0 moves pose inference into that many worker processes
+POSE_WORKERS = int(os.environ.get('POSE_WORKERS', 0))
+pose_service = PoseService(POSE_WORKERS) if POSE_WORKERS > 0 else None
+sessions = SessionManager(pose_pool, camera_index=CAMERA_SOURCE, pose_service=pose_service)
+
+def get_measurement_session():
+    """Resolve the caller's measurement session from ?session_id= or the session cookie"""
+    session_id = request.args.get('session_id') or session.get('session_id') or sessions.new_session_id()
+    session['session_id'] = session_id
+    return sessions.get(session_id, camera_index=request.args.get('camera', type=int))
 
 # Text-to-speech function
 def speak(audio):
@@ -128,91 +145,66 @@ def speak(audio):
     # Start in a separate thread to not block the main thread
     threading.Thread(target=speak_thread, args=(audio,)).start()
 
-# Face width calculation function
-def face_data(image):
-    face_width = 0
-    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = face_detector.detectMultiScale(gray_image, 1.3, 5)
-    
-    for (x, y, h, w) in faces:
-        cv2.rectangle(image, (x, y), (x+w, y+h), GREEN, 2)
-        face_width = w
-        
-    return face_width
-
-# Focal length finder function
-def Focal_Length_Finder(measured_distance, real_width, width_in_rf_image):
-
-    # finding the focal length
-    focal_length = (width_in_rf_image * measured_distance) / real_width
-    return focal_length
-
-# Distance estimation function
-def Distance_finder(Focal_Length, real_face_width, face_width_in_frame):
+def calibrate_camera(camera_index=CAMERA_SOURCE, resolution=(0, 0)):
+    ref_path = find_reference_image()
+    if ref_path is None:
+        return None
+    return calibration_cache.focal_length(ref_path, camera_index, resolution,
+                                          Known_distance, Known_width, compute_focal_length)
 
-    distance = (real_face_width * Focal_Length)/face_width_in_frame
+_reference_sizes = {}
 
-    # return the distance
-    return distance
+def remote_focal_length(frame_width):
+    """
+    Focal length for browser frames frame_width pixels wide.
 
-# Face detection generator function (from ex.py)
-def generate_face_frames():
-    global camera, button_clicked, is_measuring_height
-    
-    # Load reference image for calibration
-    ref_image = cv2.imread("Ref_image.jpg")
-    
-    # Find if reference image exists, if not check other possible locations
-    if ref_image is None:
-        # Try alternative paths
-        possible_paths = ["./Ref_image.jpg", "./images/Ref_image.jpg", "Ref_image.jpg"]
-        for path in possible_paths:
-            if os.path.exists(path):
-                ref_image = cv2.imread(path)
-                if ref_image is not None:
-                    print(f"Found reference image at: {path}")
-                    break
-        
+    Calibrated once, at the reference image's own size. A focal length in
+    pixels scales with the frame width, so browser cameras of any resolution
+    share that one calibration instead of adding one per reported size.
+    """
+    ref_path = find_reference_image()
+    if ref_path is None:
+        return None
+    ref_size = _reference_sizes.get(ref_path)
+    if ref_size is None:
+        ref_image = cv2.imread(ref_path)
         if ref_image is None:
-            print("Error: Reference image not found.")
-            return
-    
-    # Find the face width in the reference image
-    ref_image_face_width = face_data(ref_image)
-    
-    # Calculate focal length
-    Focal_length_found = Focal_Length_Finder(
-        Known_distance, Known_width, ref_image_face_width)
+            return None
+        ref_size = _reference_sizes[ref_path] = (ref_image.shape[1], ref_image.shape[0])
+    focal_length = calibrate_camera('remote', ref_size)
+    return focal_length * frame_width / ref_size[0] if focal_length else None
+
+# Face detection pipeline (from ex.py)
+def create_face_pipeline(measurement_session):
+    camera = camera_broker.subscribe(measurement_session.camera_index)
+    if camera is None:
+        return None
     
-    print(f"Calibrated focal length: {Focal_length_found}")
+    # Focal length comes from the on-disk calibration cache unless an input changed
+    Focal_length_found = calibrate_camera(measurement_session.camera_index, camera.resolution)
+    if Focal_length_found is None:
+        camera.close()
+        return None
     
-    camera = cv2.VideoCapture(0)
-    if not camera.isOpened():
-        print("Error: Could not open camera")
-        return
+    # Tracks the face between frames instead of rescanning the full frame every time
+    tracker = AdaptiveFaceDetector(face_detector)
     
-    while True:
-        success, frame = camera.read()
-        if not success:
-            print("Error: Could not read frame")
-            break
-        
-        # Face distance detection
-        face_width_in_frame = face_data(frame)
-        
-        if face_width_in_frame != 0:
-            Distance = Distance_finder(Focal_length_found, Known_width, face_width_in_frame)
-            Distance = round(Distance)
+    def draw_distance(frame, face_box):
+        if face_box is not None:
+            x, y, w, h = face_box
+            cv2.rectangle(frame, (x, y), (x+w, y+h), GREEN, 2)
+            Distance = face_distance(Focal_length_found, face_box)
             
             # Draw distance indicator
             cv2.line(frame, (30, 30), (230, 30), RED, 32)
             cv2.line(frame, (30, 30), (230, 30), BLACK, 28)
             
             # Check if person is at correct distance (290-310 cm)
-            if Distance in range(290, 310):
+            status = distance_status(Distance)
+            if status == 'perfect':
                 cv2.putText(frame, "Perfect distance for measurement!", (30, 90),
                             cv2.FONT_HERSHEY_COMPLEX, 0.6, GREEN, 2)
-            elif Distance < 290:
+            elif status == 'too_close':
                 cv2.putText(frame, "Too close - move back!", (30, 90),
                             cv2.FONT_HERSHEY_COMPLEX, 0.6, RED, 2)
             else:
@@ -222,167 +214,109 @@ def generate_face_frames():
             # Drawing Text on the screen
             cv2.putText(frame, f"Distance: {Distance} cms", (30, 35),
                        cv2.FONT_HERSHEY_COMPLEX, 0.6, GREEN, 2)
-        
-        # Check if button was clicked
-        if button_clicked or is_measuring_height:
-            if camera.isOpened():
-                camera.release()
-            break
-        
-        try:
-            # Encode the frame as JPEG
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                print("Error: Could not encode frame")
-                continue
-            frame = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-        except Exception as e:
-            print(f"Error in frame processing: {e}")
-            continue
-
-# Functions from Body_Detection.py
-def calculate_distance(x1, y1, x2, y2):
-    return np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-
-def get_body_measurements(landmarks, img_width, img_height):
-    measurements = {}
+        return frame
     
-    if not landmarks:
-        return None
+    # Capture, detection, drawing and encoding run on their own threads
+    return FramePipeline(
+        read_frame=camera.read,
+        infer=tracker.detect,
+        annotate=draw_distance,
+        encode=create_stream_encoder('face'),
+        should_stop=lambda: measurement_session.face_detection_done,  # Check if button was clicked
+        release=camera.close,
+        name='face',
+    )
+
+# Face detection generator function - every viewer of a session shares one pipeline
+def generate_face_frames(measurement_session):
+    key = ('face', measurement_session.session_id)
+    for frame in stream_hub.frames(key, lambda: create_face_pipeline(measurement_session)):
+        yield mjpeg_chunk(frame)
+
+# Measurement step shared by the MJPEG body stream and browser capture
+def measure_body_frame(measurement_session, pose_landmarks, w, h):
+    """
+    Update the session with one frame's measurements and capture them once stable.
+
+    Returns:
+        dict: points ((33, 4) landmark array), body_measurements, foot_points, head_point,
+              height, remaining_time and captured_now (True only for the frame that stored the measurements)
+    """
+    current_measurements = measurement_session.current_measurements
+    # Convert the landmark list once; everything below reads the array
+    points = landmarks_to_array(pose_landmarks)
     
-    try:
-        # Extract landmarks
-        left_shoulder = landmarks.landmark[mpPose.PoseLandmark.LEFT_SHOULDER]
-        right_shoulder = landmarks.landmark[mpPose.PoseLandmark.RIGHT_SHOULDER]
-        left_hip = landmarks.landmark[mpPose.PoseLandmark.LEFT_HIP]
-        right_hip = landmarks.landmark[mpPose.PoseLandmark.RIGHT_HIP]
-        
-        # Verify visibility
-        if (left_shoulder.visibility < 0.5 or right_shoulder.visibility < 0.5 or
-            left_hip.visibility < 0.5 or right_hip.visibility < 0.5):
-            return None
-            
-        # Calculate pixel coordinates
-        ls_x, ls_y = int(left_shoulder.x * img_width), int(left_shoulder.y * img_height)
-        rs_x, rs_y = int(right_shoulder.x * img_width), int(right_shoulder.y * img_height)
-        lh_x, lh_y = int(left_hip.x * img_width), int(left_hip.y * img_height)
-        rh_x, rh_y = int(right_hip.x * img_width), int(right_hip.y * img_height)
-        
-        # Calculate measurements
-        shoulder_width_px = calculate_distance(ls_x, ls_y, rs_x, rs_y)
-        waist_width_px = abs(rh_x - lh_x)
-        
-        # Convert to centimeters
-        shoulder_width_cm = round(shoulder_width_px * HEIGHT_CALIBRATION_FACTOR, 1)
-        waist_width_cm = round(waist_width_px * HEIGHT_CALIBRATION_FACTOR, 1)
-        
-        # Estimate circumferences
-        chest_circumference_cm = round(shoulder_width_cm * CHEST_CIRCUMFERENCE_FACTOR, 1)
-        waist_circumference_cm = round(waist_width_cm * WAIST_CIRCUMFERENCE_FACTOR, 1)
-        
-        # Store results
-        measurements['shoulder_width'] = shoulder_width_cm
-        measurements['chest_circumference'] = chest_circumference_cm
-        measurements['waist_circumference'] = waist_circumference_cm
-        
-        return measurements
-        
-    except Exception as e:
-        print(f"Error calculating body measurements: {e}")
-        return None
-
-# Calibration functions
-def calibrate_camera():
-    global camera, calibration_complete
+    # Get body measurements using our function
+    body_measurements = get_body_measurements(points, w, h)
+    if body_measurements:
+        current_measurements["shoulder_width"] = body_measurements["shoulder_width"]
+        current_measurements["chest_circumference"] = body_measurements["chest_circumference"]
+        current_measurements["waist_circumference"] = body_measurements["waist_circumference"]
     
-    # Load reference image
-    ref_image = cv2.imread("Ref_image.jpg")
-    if ref_image is None:
-        # Try alternative paths
-        possible_paths = ["./Ref_image.jpg", "./images/Ref_image.jpg", "Ref_image.jpg"]
-        for path in possible_paths:
-            if os.path.exists(path):
-                ref_image = cv2.imread(path)
-                if ref_image is not None:
-                    print(f"Found reference image at: {path}")
-                    break
+    # Measure height
+    foot_points, head_point = height_keypoints(points, w, h)
+    height_cm = measure_height(foot_points, head_point)
+    if height_cm is not None:
+        current_measurements["height"] = height_cm
     
-    if ref_image is None:
-        print("Error: Reference image not found.")
-        return None
-    
-    # Find face width in reference image
-    ref_image_face_width = face_data(ref_image)
+    # Handle countdown and measurement capture
+    remaining_time = measurement_session.remaining_time()
+    captured_now = False
+    if not measurement_session.measurements_captured:
+        measurement_session.add_frame(dict(body_measurements or {}, height=height_cm),
+                                      measurement_confidence(points))
+        
+        # Capture early once the measurements are stable, at the latest when the countdown ends
+        if measurement_session.should_capture(remaining_time):
+            # Capture measurements
+            row = measurement_session.capture()
+            with DB_INSERT_SECONDS.labels('sqlite').time():
+                row['id'] = save_measurement(row)
+            MEASUREMENTS_CAPTURED.inc()
+            session_events.measurement(measurement_session.session_id, row)
+            captured_now = True
     
-    # Calculate focal length
-    focal_length = Focal_Length_Finder(Known_distance, Known_width, ref_image_face_width)
-    print(f"Calibrated focal length: {focal_length}")
+    # Countdown and stability go to the session's pages as events, not as pixels in the frame
+    session_events.progress(measurement_session)
     
-    return focal_length
+    return {
+        'points': points,
+        'body_measurements': body_measurements,
+        'foot_points': foot_points,
+        'head_point': head_point,
+        'height': height_cm,
+        'remaining_time': remaining_time,
+        'captured_now': captured_now,
+    }
 
-# Body detection generator function
-def generate_body_frames():
-    global camera
-    
-    # Initialize camera if not already open
-    if camera is None or not camera.isOpened():
-        camera = cv2.VideoCapture(0)
+# Body detection pipeline
+def create_body_pipeline(measurement_session):
+    camera = camera_broker.subscribe(measurement_session.camera_index)
+    if camera is None:
+        return None
     
     ptime = 0
-    measurements_captured = False
-    current_measurements = {
-        "height": 0,
-        "shoulder_width": 0,
-        "chest_circumference": 0,
-        "waist_circumference": 0,
-        "timestamp": "",
-    }
-    
-    # Initialize countdown variables
-    start_time = time.time()
-    countdown_started = False
-    countdown_duration = 8  # seconds - to match user's code
-    
-    # Initialize database connection
-    db_conn = sqlite3.connect(DB_PATH)
-    cursor = db_conn.cursor()
+    # Levels whose model failed to load for this session are skipped
+    governor = QualityGovernor(target_fps=TARGET_FPS, unavailable=measurement_session.unavailable_complexities)
     
-    # Create table if not exists
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS measurements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            height REAL,
-            shoulder_width REAL,
-            chest_circumference REAL,
-            waist_circumference REAL
-        )
-    ''')
-    db_conn.commit()
+    def detect_pose(img):
+        # Landmarks are normalised, so they still line up with the full-size frame
+        level = governor.level
+        img_rgb = cv2.cvtColor(scale_to_width(img, level['max_width']), cv2.COLOR_BGR2RGB)
+        return pose.process(img_rgb, level['model_complexity'])
     
-    while True:
-        success, img = camera.read()
-        if not success:
-            break
-            
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        result = pose.process(img_rgb)
-
+    def draw_measurements(img, result):
+        # Runs on the annotate thread only, so the countdown state needs no lock
+        nonlocal ptime
+        measurement_session.touch()
+        
         if result.pose_landmarks:
             mpDraw.draw_landmarks(img, result.pose_landmarks, mpPose.POSE_CONNECTIONS)
             h, w, c = img.shape
-            
-            # Get body measurements using our function
-            body_measurements = get_body_measurements(result.pose_landmarks, w, h)
+            frame = measure_body_frame(measurement_session, result.pose_landmarks, w, h)
+            body_measurements = frame['body_measurements']
             
             if body_measurements:
-                current_measurements["shoulder_width"] = body_measurements["shoulder_width"]
-                current_measurements["chest_circumference"] = body_measurements["chest_circumference"]
-                current_measurements["waist_circumference"] = body_measurements["waist_circumference"]
-                
                 # Display measurements on frame
                 cv2.putText(img, f"Shoulder: {body_measurements['shoulder_width']}cm", (40, 110), 
                           cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 255, 255), 2)
@@ -391,77 +325,126 @@ def generate_body_frames():
                 cv2.putText(img, f"Waist: {body_measurements['waist_circumference']}cm", (40, 190), 
                           cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 255, 255), 2)
             
-            # Measure height
-            cx1, cy1, cx2, cy2 = 0, 0, 0, 0
-            for id, lm in enumerate(result.pose_landmarks.landmark):
-                if id == 32 or id == 31:  # Left/Right ankle
-                    cx1, cy1 = int(lm.x * w), int(lm.y * h)
-                    cv2.circle(img, (cx1, cy1), 15, (0, 0, 0), cv2.FILLED)
-                if id == 6:  # Nose
-                    cx2, cy2 = int(lm.x * w), int(lm.y * h)
-                    cy2 += 20  # Adjust for top of head
-                    cv2.circle(img, (cx2, cy2), 15, (0, 0, 0), cv2.FILLED)
-
-            if cx1 and cy1 and cx2 and cy2:
-                d = math.sqrt((cx2 - cx1) ** 2 + (cy2 - cy1) ** 2)
-                height_cm = round(d * HEIGHT_CALIBRATION_FACTOR)
+            for point in frame['foot_points'] + [frame['head_point']]:  # Left/Right ankle and head
+                cv2.circle(img, point, 15, (0, 0, 0), cv2.FILLED)
+
+            if frame['height'] is not None:
                 cv2.putText(img, "Height : ", (40, 70), cv2.FONT_HERSHEY_COMPLEX, 1, (0, 255, 255), 2)
-                cv2.putText(img, str(height_cm), (180, 70), cv2.FONT_HERSHEY_DUPLEX, 1, (0, 255, 255), 2)
+                cv2.putText(img, str(frame['height']), (180, 70), cv2.FONT_HERSHEY_DUPLEX, 1, (0, 255, 255), 2)
                 cv2.putText(img, "cms", (240, 70), cv2.FONT_HERSHEY_PLAIN, 2, (0, 255, 255), 2)
-                current_measurements["height"] = height_cm
 
-            # Handle countdown and measurement capture
-            if not countdown_started:
-                countdown_started = True
-                start_time = time.time()
-            
-            elapsed_time = time.time() - start_time
-            remaining_time = max(0, countdown_duration - int(elapsed_time))
-            
-            if remaining_time > 0:
-                # Display countdown
-                cv2.putText(img, f"Capturing in: {remaining_time}s", (40, 400), 
-                          cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 255, 255), 2)
-            elif not measurements_captured:
-                # Capture measurements
-                current_measurements["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                cursor.execute('''
-                    INSERT INTO measurements (timestamp, height, shoulder_width, chest_circumference, waist_circumference)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    current_measurements["timestamp"],
-                    current_measurements["height"],
-                    current_measurements["shoulder_width"],
-                    current_measurements["chest_circumference"],
-                    current_measurements["waist_circumference"]
-                ))
-                db_conn.commit()
-                measurements_captured = True
+            if frame['captured_now']:
                 speak("Pengukuran selesai")  # Add voice notification in Indonesian
 
-            # Display capture status
-            if measurements_captured:
-                cv2.putText(img, "Measurements saved to database!", (40, 440), 
-                          cv2.FONT_HERSHEY_COMPLEX, 0.7, (0, 255, 0), 2)
-
         img = cv2.resize(img, (700, 500))
         ctime = time.time()
         fps = 1 / (ctime - ptime)
+        if ptime:
+            governor.update(fps)
         ptime = ctime
         cv2.putText(img, "FPS : ", (40, 30), cv2.FONT_HERSHEY_PLAIN, 2, (0, 0, 0), 2)
         cv2.putText(img, str(int(fps)), (160, 30), cv2.FONT_HERSHEY_PLAIN, 2, (0, 0, 0), 2)
+        return img
+    
+    # The pipeline owns the graph it borrows and hands back only that one
+    pose = measurement_session.acquire_pose(timeout=5)
+    if pose is None:
+        print("Error: No pose instance available")
+        camera.close()
+        return None
+    
+    # Capture, pose inference, drawing and encoding run on their own threads
+    return FramePipeline(
+        read_frame=camera.read,
+        infer=detect_pose,
+        annotate=draw_measurements,
+        encode=create_stream_encoder('body'),
+        release=camera.close,
+        on_finished=pose.release,
+        metadata=governor.describe,
+        name='body',
+    )
+
+# Body detection generator function - every viewer of a session shares one pipeline
+def generate_body_frames(measurement_session):
+    key = ('body', measurement_session.session_id)
+    for frame in stream_hub.frames(key, lambda: create_body_pipeline(measurement_session)):
+        yield mjpeg_chunk(frame)
+
+# Binary Socket.IO transport for the same streams - the MJPEG routes stay as a fallback
+stream_socket = StreamSocketHub(socketio, stream_hub, sessions.get, {
+    'face': create_face_pipeline,
+    'body': create_body_pipeline,
+})
+
+# Browser capture - remote booths upload their own webcam frames over Socket.IO
+REMOTE_MAX_WIDTH = int(os.environ.get('REMOTE_MAX_WIDTH', 640))  # Browsers downscale to this width before upload
+
+def create_remote_face_client(measurement_session):
+    tracker = AdaptiveFaceDetector(face_detector)
+    
+    def detect_distance(image, source_size):
+        # Focal length and face width both in the uploaded frame's pixels, whatever the camera's size
+        Focal_length_found = remote_focal_length(image.shape[1])
+        if Focal_length_found is None:
+            return {'error': 'calibration failed'}
         
-        # Encode the frame as JPEG
-        ret, buffer = cv2.imencode('.jpg', img)
-        frame = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        result = {'face': None, 'distance': None, 'status': None,
+                  'done': measurement_session.face_detection_done}
+        face_box = tracker.detect(image)
+        if face_box is not None:
+            Distance = face_distance(Focal_length_found, face_box)
+            result.update(face=[int(v) for v in face_box], distance=Distance, status=distance_status(Distance))
+        return result
+    
+    return RemoteClient(detect_distance, name='face')
 
-    # Clean up
-    db_conn.close()
-    if camera.isOpened():
-        camera.release()
+def create_remote_body_client(measurement_session):
+    # A graph of its own, so it never runs interleaved with the session's MJPEG body stream
+    pose = measurement_session.acquire_pose(timeout=5)
+    if pose is None:
+        print("Error: No pose instance available")
+        return None
+    
+    def measure(image, source_size):
+        measurement_session.touch()
+        result = pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        response = {'landmarks': None}
+        if result.pose_landmarks:
+            # Landmarks are normalised, so measure in the camera's own pixels like the server streams do
+            w, h = source_size
+            frame = measure_body_frame(measurement_session, result.pose_landmarks, w, h)
+            response.update(
+                landmarks=frame['points'][:, [0, 1, 3]].tolist(),
+                remaining_time=frame['remaining_time'],
+                progress=measurement_session.window.progress())
+        response.update(measurements=dict(measurement_session.current_measurements),
+                        captured=measurement_session.measurements_captured)
+        return response
+    
+    return RemoteClient(measure, on_finished=pose.release,
+                        info={'connections': sorted(mpPose.POSE_CONNECTIONS)}, name='body')
+
+session_events = SessionEvents(socketio, sessions.get)
+sessions.on_close(session_events.forget)
+
+remote_capture = RemoteCaptureHub(socketio, sessions.get, {
+    'face': create_remote_face_client,
+    'body': create_remote_body_client,
+})
+
+# Gauges are read from the live objects whenever /metrics is scraped
+registry.gauge('active_streams', 'Running processed-camera streams', callback=lambda: stream_hub.active_streams)
+registry.gauge('open_cameras', 'Camera devices currently open', callback=lambda: camera_broker.open_cameras)
+registry.gauge('socket_viewers', 'Socket.IO clients watching a stream', callback=lambda: stream_socket.active_viewers)
+registry.gauge('remote_clients', 'Browser booths uploading frames', callback=lambda: remote_capture.active_clients)
+registry.gauge('measurement_sessions', 'Live measurement sessions', callback=lambda: len(sessions))
+registry.gauge('pose_graphs_in_use', 'Pose graphs borrowed from the pool', callback=lambda: pose_pool.in_use)
+registry.gauge('pipeline_queue_depth', 'Frames waiting between pipeline stages', ('stream',),
+               callback=stream_hub.queue_depths)
+registry.gauge('pose_service_queue_depth', 'Frames waiting for a pose worker process', ('worker',),
+               callback=lambda: dict(((str(i),), depth) for i, depth in enumerate(pose_service.queue_depths()))
+               if pose_service is not None else {})
 
 # Socket.IO event handlers
 @socketio.on('connect')
@@ -483,92 +466,142 @@ def index():
 
 @app.route('/face_detection')
 def face_detection():
-    global is_measuring_height, button_clicked
-    button_clicked = False
-    is_measuring_height = False
-    return render_template('face_detection.html')
+    measurement_session = get_measurement_session()
+    measurement_session.start_face_detection()
+    return render_template('face_detection.html', session_id=measurement_session.session_id)
 
 @app.route('/body_detection')
 def body_detection():
-    global is_measuring_height
-    is_measuring_height = True
+    measurement_session = get_measurement_session()
+    measurement_session.start_body_measurement()
     speak("Starting body measurement")
     latest_measurement = get_latest_measurement()
-    return render_template('body_detection.html', last_measurement=latest_measurement)
+    return render_template('body_detection.html', last_measurement=latest_measurement,
+                           session_id=measurement_session.session_id)
 
 @app.route('/measurements')
 def measurements():
-    all_measurements = get_all_measurements()
+    # One keyset page at a time, so the page costs the same however long the history gets
+    try:
+        options = parse_page_args(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('measurements'))
+    options.pop('fields', None)
+    page = get_measurements_page(**options)
     latest_measurement = get_latest_measurement()
+    # Filters carry over to the older/newer links, positions do not
+    filters = {k: v for k, v in request.args.items() if k not in ('before', 'after', 'cursor')}
     return render_template('measurements.html', 
-                         measurements=all_measurements,
-                         latest=latest_measurement)
+                         measurements=page['items'],
+                         latest=latest_measurement,
+                         page=page,
+                         filters=filters)
+
+def conditional_json(build):
+    """
+    Answer a polling client from the table's change counter.
+
+    A client whose If-None-Match / If-Modified-Since still matches gets an
+    empty 304 before any query runs; otherwise build() makes the JSON body.
+    Without a version (the backend could not be probed) no validators are sent.
+    """
+    version = get_measurements_version()
+    if version is None:
+        return jsonify(build())
+    tag, changed_at = version
+    last_modified = datetime.fromtimestamp(int(changed_at), timezone.utc)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(tag)
+    else:
+        not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
+    response = Response(status=304) if not_modified else jsonify(build())
+    response.set_etag(tag)
+    response.last_modified = last_modified
+    # Caches may keep the body but must check back every time
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/measurements')
 def api_measurements():
-    measurements = get_all_measurements()
-    return jsonify(measurements)
+    try:
+        options = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return conditional_json(lambda: get_measurements_page(**options))
 
 @app.route('/api/latest-measurement')
 def api_latest_measurement():
-    measurement = get_latest_measurement()
-    return jsonify(measurement if measurement else {})
+    return conditional_json(lambda: get_latest_measurement() or {})
+
+@app.route('/api/pose-service')
+def api_pose_service():
+    if pose_service is None:
+        return jsonify({'workers': 0})
+    return jsonify(pose_service.stats())
+
+@app.route('/api/streams')
+def api_streams():
+    return jsonify(stream_hub.stats())
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 @app.route('/video_feed_face')
 def video_feed_face():
-    return Response(generate_face_frames(),
+    return Response(generate_face_frames(get_measurement_session()),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/video_feed_body')
 def video_feed_body():
-    return Response(generate_body_frames(),
+    return Response(generate_body_frames(get_measurement_session()),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/switch_to_body')
 def switch_to_body():
-    global button_clicked
-    button_clicked = True
-    return redirect(url_for('body_detection'))
+    measurement_session = get_measurement_session()
+    measurement_session.button_clicked = True
+    return redirect(url_for('body_detection', session_id=measurement_session.session_id))
 
 @app.route('/switch_to_face')
 def switch_to_face():
-    return redirect(url_for('face_detection'))
+    measurement_session = get_measurement_session()
+    return redirect(url_for('face_detection', session_id=measurement_session.session_id))
+
+@app.route('/remote_capture')
+def remote_capture_page():
+    """Booth page that measures from the browser's own webcam"""
+    mode = request.args.get('mode', 'face')
+    measurement_session = get_measurement_session()
+    if mode == 'body':
+        measurement_session.start_body_measurement()
+    else:
+        mode = 'face'
+        measurement_session.start_face_detection()
+    return render_template('remote_capture.html', mode=mode, session_id=measurement_session.session_id,
+                           max_width=REMOTE_MAX_WIDTH)
+
+# Rendered PDFs by measurement ID and content, for downloads and email resends
+report_cache = ReportCache(int(os.environ.get('PDF_CACHE_SIZE', 64)))
 
 def generate_measurement_pdf(measurement_data):
-    """Generate a PDF with measurement results"""
-    # Create a temporary file
-    temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
-    pdf_path = temp_file.name
-    temp_file.close()
-    
-    # Create PDF with measurement data
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Build content
-    content = []
-    content.append(Paragraph("Measurement Results", styles['Heading1']))
-    
-    # Create table with measurements
-    data = [
-        ["Measurement", "Value (cm)"],
-        ["Height", f"{measurement_data['height']}"],
-        ["Shoulder Width", f"{measurement_data['shoulder_width']}"],
-        ["Chest Circumference", f"{measurement_data['chest_circumference']}"],
-        ["Waist Circumference", f"{measurement_data['waist_circumference']}"]
-    ]
-    
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('BACKGROUND', (0, 0), (1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (1, 0), colors.whitesmoke)
-    ]))
-    
-    content.append(table)
-    doc.build(content)
-    
-    return pdf_path
+    """Generate a PDF with measurement results; repeats come from the report cache"""
+    pdf, _ = report_cache.get(measurement_data)
+    return pdf
+
+def get_measurement(measurement_id):
+    page = get_measurements_page(limit=1, ids=[measurement_id])
+    return page['items'][0] if page['items'] else None
+
+@app.route('/measurements/<int:measurement_id>/pdf')
+def measurement_pdf(measurement_id):
+    measurement = get_measurement(measurement_id)
+    if measurement is None:
+        return jsonify({'error': 'Measurement not found'}), 404
+    pdf, digest = report_cache.get(measurement)
+    return send_file(BytesIO(pdf), mimetype='application/pdf', as_attachment=True,
+                     download_name=f'measurement_{measurement_id}.pdf', etag=digest, conditional=True)
 
 @app.route('/email_form')
 def email_form():
@@ -594,7 +627,8 @@ def send_measurements():
     
     try:
         # Generate PDF
-        pdf_path = generate_measurement_pdf(measurements)
+        pdf = generate_measurement_pdf(measurements)
+        JOBS.labels('pdf', 'ok').inc()
         
         try:
             # Create email message
@@ -625,10 +659,9 @@ Body Measurement System
             msg.attach(MIMEText(body, 'plain'))
             
             # Attach PDF
-            with open(pdf_path, 'rb') as file:
-                attachment = MIMEApplication(file.read(), _subtype='pdf')
-                attachment.add_header('Content-Disposition', 'attachment', filename='measurement_results.pdf')
-                msg.attach(attachment)
+            attachment = MIMEApplication(pdf, _subtype='pdf')
+            attachment.add_header('Content-Disposition', 'attachment', filename='measurement_results.pdf')
+            msg.attach(attachment)
             
             # Send email via SMTP
             try:
@@ -646,36 +679,26 @@ Body Measurement System
                 print("Closing connection")
                 server.quit()
                 print("Email sent successfully")
+                JOBS.labels('email', 'ok').inc()
             except Exception as smtp_error:
                 print(f"Detailed SMTP error: {smtp_error}")
                 raise
             
-            os.unlink(pdf_path)  # Clean up temporary file
-            
             flash('Measurement results sent successfully to your email!', 'success')
             return redirect(url_for('email_form'))
             
         except Exception as e:
-            # If email fails, still provide the PDF as a download
-            save_dir = os.path.join(os.path.dirname(app.root_path), 'static', 'downloads')
-            os.makedirs(save_dir, exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"measurements_{timestamp}.pdf"
-            output_path = os.path.join(save_dir, output_filename)
-            
-            import shutil
-            shutil.copy2(pdf_path, output_path)
-            os.unlink(pdf_path)
-            
-            download_url = url_for('static', filename=f'downloads/{output_filename}')
+            JOBS.labels('email', 'error').inc()
+            # If email fails, still provide the PDF as a download - served from the report cache
+            download_url = url_for('measurement_pdf', measurement_id=measurements['id'])
             
             flash(f'Email could not be sent: {str(e)}. <a href="{download_url}" download>Click here to download your PDF</a>', 'warning')
             return redirect(url_for('email_form'))
         
     except Exception as e:
+        JOBS.labels('pdf', 'error').inc()
         flash(f'Error generating PDF: {str(e)}', 'error')
         return redirect(url_for('email_form'))
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    socketio.run(app, debug=True) 
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""
+Headless batch measurement of archived captures.
+
+Runs the same pose + measurement logic as the live body stream over a
+directory of images and/or videos, spread across a process pool, and
+writes one row per capture as soon as it finishes.
+
+Usage:
+    python batch_measure.py captures/ -o results.csv
+    python batch_measure.py captures/ -o results.parquet --workers 8 --frame-step 5
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from body_measurement import MEASUREMENT_KEYS, landmarks_to_array, measure_batch, robust_average
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+
+COLUMNS = ['source', 'height', 'shoulder_width', 'chest_circumference',
+           'waist_circumference', 'confidence', 'frames', 'error']
+
+mpPose = mp.solutions.pose
+
+# Per-worker pose graph for still images, created once by _init_worker
+_image_pose = None
+_frame_step = 1
+
+
+def find_captures(input_dir, recursive=False):
+    captures = []
+    for root, dirs, files in os.walk(input_dir):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                captures.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return sorted(captures)
+
+
+def detect_landmarks(pose, image):
+    """Run pose on one BGR frame; returns a (33, 4) landmark array or None when no body was found"""
+    result = pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    if not result.pose_landmarks:
+        return None
+    return landmarks_to_array(result.pose_landmarks)
+
+
+def measure_frames(frame_landmarks, img_width, img_height):
+    """Measure all frames of a capture in one measure_batch call; returns one dict per frame"""
+    if not frame_landmarks:
+        return []
+    batch = measure_batch(np.stack(frame_landmarks), img_width, img_height)
+    return [{key: None if np.isnan(values[i]) else float(values[i]) for key, values in batch.items()}
+            for i in range(len(frame_landmarks))]
+
+
+def summarise(source, frame_rows):
+    """Collapse the per-frame measurements of one capture into a single row (robust average per column)"""
+    row = {column: None for column in COLUMNS}
+    row['source'] = source
+    row['frames'] = len(frame_rows)
+    if not frame_rows:
+        row['error'] = 'no body detected'
+        return row
+
+    for key in MEASUREMENT_KEYS + ('confidence',):
+        values = [r[key] for r in frame_rows if r.get(key) is not None]
+        if values:
+            row[key] = round(robust_average(values), 1 if key != 'confidence' else 3)
+    return row
+
+
+def measure_capture(path):
+    try:
+        if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError("could not read image")
+            landmarks = detect_landmarks(_image_pose, image)
+            h, w = image.shape[:2]
+            return summarise(path, measure_frames([landmarks] if landmarks is not None else [], w, h))
+
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise ValueError("could not open video")
+        frame_landmarks = []
+        w = h = 0
+        # Video frames are consecutive, so use a tracking graph per file
+        with mpPose.Pose() as pose:
+            index = 0
+            while True:
+                success, frame = capture.read()
+                if not success:
+                    break
+                if index % _frame_step == 0:
+                    h, w = frame.shape[:2]
+                    landmarks = detect_landmarks(pose, frame)
+                    if landmarks is not None:
+                        frame_landmarks.append(landmarks)
+                index += 1
+        capture.release()
+        # Pose runs per frame; the measurements for the whole clip are one vectorised call
+        return summarise(path, measure_frames(frame_landmarks, w, h))
+
+    except Exception as e:
+        row = summarise(path, [])
+        row['error'] = str(e)
+        return row
+
+
+def _init_worker(frame_step):
+    global _image_pose, _frame_step
+    _image_pose = mpPose.Pose(static_image_mode=True)
+    _frame_step = frame_step
+
+
+class CsvResultWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetResultWriter:
+    """Writes rows to Parquet in row groups of batch_size"""
+
+    def __init__(self, path, batch_size=256):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow: pip install -r requirements-parquet.txt")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('source', pa.string()),
+            ('height', pa.float64()),
+            ('shoulder_width', pa.float64()),
+            ('chest_circumference', pa.float64()),
+            ('waist_circumference', pa.float64()),
+            ('confidence', pa.float64()),
+            ('frames', pa.int64()),
+            ('error', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(self.pa.Table.from_pylist(self.rows, schema=self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_writer(path, output_format=None):
+    output_format = output_format or ('parquet' if path.endswith('.parquet') else 'csv')
+    if output_format == 'parquet':
+        return ParquetResultWriter(path)
+    return CsvResultWriter(path)
+
+
+def run_batch(input_dir, output_path, workers=None, recursive=False, frame_step=1, output_format=None):
+    captures = find_captures(input_dir, recursive=recursive)
+    if not captures:
+        print(f"No images or videos found in {input_dir}")
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Measuring {len(captures)} captures with {workers} workers -> {output_path}")
+
+    writer = open_writer(output_path, output_format)
+    start = time.time()
+    done = 0
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(frame_step,)) as pool:
+            # Rows are written in completion order so long videos never hold back the rest
+            for row in pool.imap_unordered(measure_capture, captures):
+                writer.write(row)
+                done += 1
+                status = row['error'] or f"height {row['height']} cm"
+                print(f"[{done}/{len(captures)}] {row['source']}: {status}")
+    finally:
+        writer.close()
+
+    elapsed = time.time() - start
+    print(f"Done: {done} captures in {elapsed:.1f}s ({done / elapsed:.1f} captures/s)")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure every image/video in a directory")
+    parser.add_argument('input_dir', help="Directory with images and/or videos")
+    parser.add_argument('-o', '--output', default='batch_measurements.csv',
+                        help="Output file (.csv or .parquet)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="Override the format implied by --output")
+    parser.add_argument('-w', '--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('-r', '--recursive', action='store_true', help="Include subdirectories")
+    parser.add_argument('--frame-step', type=int, default=1, help="Measure every Nth video frame")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"{args.input_dir} is not a directory")
+
+    try:
+        run_batch(args.input_dir, args.output, workers=args.workers, recursive=args.recursive,
+                  frame_step=max(1, args.frame_step), output_format=args.format)
+    except (RuntimeError, OSError) as e:
+        # pyarrow missing, or the output path cannot be written
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
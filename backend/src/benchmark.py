@@ -0,0 +1,232 @@
+"""
+Camera-free benchmark of the measurement hot path.
+
+Replays stills and a short clip through every stage of the face and body
+streams, times each stage separately and reports p50/p95/p99 latency and
+frames/s. Results can be saved as a baseline (JSON, stable key order) and
+later runs compared against it, so regressions show up as diffs.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --save-baseline
+    python benchmark.py --compare --fail-on-regression
+
+The baseline is machine-specific: record it with --save-baseline on the
+machine that runs the comparison. The committed benchmark_baseline.sample.json
+(recorded on a 1-CPU sandbox) only shows the format; comparing against it
+reports differences but never fails the run.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from video_source import SyntheticSource, VideoFileSource
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
+
+DEFAULT_INPUTS = [
+    os.path.join(REPO_ROOT, 'images', 'height.png'),
+    os.path.join(REPO_ROOT, 'Ref_image.jpg'),
+    os.path.join(REPO_ROOT, 'backend', 'assets', 'benchmark_clip.mp4'),
+]
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'backend', 'benchmark_baseline.json')  # Local, not committed
+SAMPLE_BASELINE = os.path.join(REPO_ROOT, 'backend', 'benchmark_baseline.sample.json')
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+
+
+def make_clip(source_image, path, frames=24, fps=12, size=(1280, 720)):
+    """
+    Write a short clip of source_image swaying and zooming slightly.
+
+    This is how backend/assets/benchmark_clip.mp4 was made from images/height.png;
+    the motion keeps pose tracking and the face tracker's ROI search honest.
+    """
+    source = SyntheticSource(size=size, fps=fps, realtime=False, frames=frames, image=source_image, period=frames)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        writer.write(frame)
+    writer.release()
+
+
+def load_frames(paths, repeat):
+    """Return (name, frames) per input; stills are repeated, clips are read frame by frame"""
+    inputs = []
+    for path in paths:
+        if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+            capture = VideoFileSource(path, realtime=False)
+            frames = []
+            while True:
+                success, frame = capture.read()
+                if not success:
+                    break
+                frames.append(frame)
+            capture.release()
+        else:
+            image = cv2.imread(path)
+            frames = [image] * repeat if image is not None else []
+        if not frames:
+            print(f"Skipping {path}: could not read it")
+            continue
+        inputs.append((os.path.basename(path), frames))
+    return inputs
+
+
+class StageTimer:
+    """Collects per-call durations for each named stage"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        results = {}
+        for stage, samples in self.samples.items():
+            ms = np.array(samples) * 1000
+            results[stage] = {
+                'calls': len(ms),
+                'p50_ms': round(float(np.percentile(ms, 50)), 3),
+                'p95_ms': round(float(np.percentile(ms, 95)), 3),
+                'p99_ms': round(float(np.percentile(ms, 99)), 3),
+                'fps': round(float(1000 / ms.mean()), 1) if ms.mean() > 0 else None,
+            }
+        return results
+
+
+def run_benchmark(paths, repeat=30, warmup=3):
+    # The stages are the ones the streams run; face_measurement loads no database or app
+    import mediapipe as mp
+    import face_measurement as face
+    from body_measurement import get_body_measurements, landmarks_to_array, measure_batch
+    from face_tracking import AdaptiveFaceDetector
+    from stream_encoder import StreamEncoder
+
+    ref_image = cv2.imread(face.find_reference_image() or DEFAULT_INPUTS[1])
+    ref_width = face.face_data(ref_image.copy())
+    timer = StageTimer()
+
+    for name, frames in load_frames(paths, repeat):
+        print(f"Benchmarking {name} ({len(frames)} frames)")
+        tracker = AdaptiveFaceDetector(face.face_detector)
+        encoder = StreamEncoder()
+        static = len(set(id(frame) for frame in frames)) == 1
+        with mp.solutions.pose.Pose(static_image_mode=static) as pose:
+            for index, source in enumerate(frames):
+                # Warm-up frames run every stage but are not recorded
+                stage_timer = timer if index >= warmup else StageTimer()
+                frame = source.copy()
+
+                face_width = stage_timer.time('face_data', face.face_data, frame.copy())
+                face_box = stage_timer.time('face_tracker', tracker.detect, frame)
+                if face_width:
+                    stage_timer.time('distance', lambda: face.Distance_finder(
+                        face.Focal_Length_Finder(face.Known_distance, face.Known_width, ref_width),
+                        face.Known_width, face_width))
+
+                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                result = stage_timer.time('pose_process', pose.process, rgb)
+                h, w = frame.shape[:2]
+                if result.pose_landmarks:
+                    points = stage_timer.time('landmarks_to_array', landmarks_to_array, result.pose_landmarks)
+                    stage_timer.time('get_body_measurements', get_body_measurements, result.pose_landmarks, w, h)
+                    stage_timer.time('measure_batch', measure_batch, points[np.newaxis], w, h)
+                    stage_timer.time('draw_pose_overlay', mp.solutions.drawing_utils.draw_landmarks, frame, result.pose_landmarks,
+                                     mp.solutions.pose.POSE_CONNECTIONS)
+                if face_box is not None:
+                    x, y, bw, bh = face_box
+                    stage_timer.time('draw_face_overlay', cv2.rectangle, frame, (x, y), (x + bw, y + bh), face.GREEN, 2)
+
+                small = stage_timer.time('resize', cv2.resize, frame, (700, 500))
+                stage_timer.time('imencode', cv2.imencode, '.jpg', small)
+                stage_timer.time('stream_encoder', encoder.encode, small)
+
+    return timer.summary()
+
+
+def print_report(results, baseline=None, threshold=0.2):
+    """Print the stage table; with a baseline, flag stages whose p50 got more than threshold slower"""
+    regressions = []
+    header = f"{'stage':<24}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>10}"
+    if baseline:
+        header += f"{'p50 vs base':>14}"
+    print(header)
+    for stage in sorted(results):
+        row = results[stage]
+        line = (f"{stage:<24}{row['calls']:>7}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+                f"{row['p99_ms']:>10.3f}{row['fps'] or 0:>10.1f}")
+        base = (baseline or {}).get(stage)
+        if base and base['p50_ms']:
+            change = row['p50_ms'] / base['p50_ms'] - 1
+            line += f"{change:>+13.0%}"
+            if change > threshold:
+                line += "  REGRESSION"
+                regressions.append(stage)
+        print(line)
+    return regressions
+
+
+def save_baseline(path, results):
+    data = {
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'opencv': cv2.__version__, 'cpus': os.cpu_count()},
+        'stages': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"Saved baseline to {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of the measurement pipeline without a camera")
+    parser.add_argument('inputs', nargs='*', default=DEFAULT_INPUTS, help="Images and/or videos to replay")
+    parser.add_argument('--repeat', type=int, default=30, help="Times each still image is replayed")
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help="Write results as the baseline")
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, help="Compare against a baseline file")
+    parser.add_argument('--threshold', type=float, default=0.2, help="p50 slowdown that counts as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on a regression")
+    parser.add_argument('--make-clip', metavar='PATH', help="Write the synthetic benchmark clip and exit")
+    args = parser.parse_args(argv)
+
+    if args.make_clip:
+        make_clip(DEFAULT_INPUTS[0], args.make_clip)
+        return 0
+
+    results = run_benchmark(args.inputs, repeat=args.repeat)
+    baseline = None
+    sample = False
+    if args.compare:
+        path = args.compare
+        if path == DEFAULT_BASELINE and not os.path.exists(path):
+            path = SAMPLE_BASELINE
+        with open(path) as f:
+            data = json.load(f)
+        baseline = data['stages']
+        sample = data.get('sample', False)
+        if sample:
+            print(f"Comparing against {os.path.basename(path)}, a sample from another machine; "
+                  f"record a local baseline with --save-baseline")
+    regressions = print_report(results, baseline, args.threshold)
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+    if regressions and args.fail_on_regression and not sample:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
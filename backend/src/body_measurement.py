@@ -0,0 +1,210 @@
+import math
+from collections import deque
+
+import mediapipe as mp
+import numpy as np
+
+mpPose = mp.solutions.pose
+
+# Calibration factors for body measurements
+HEIGHT_CALIBRATION_FACTOR = 0.48
+SHOULDER_CALIBRATION_FACTOR = 1
+CHEST_CIRCUMFERENCE_FACTOR = 1.2
+WAIST_CIRCUMFERENCE_FACTOR = 1.7
+HIP_CIRCUMFERENCE_FACTOR = 2.5
+
+# Landmarks used for height: right/left foot and the head reference point
+FOOT_LANDMARKS = (31, 32)
+HEAD_LANDMARK = 6
+HEAD_OFFSET_PX = 20  # Adjust for top of head
+
+# Landmarks for shoulder width and waist; all four must be visible
+SHOULDER_HIP_LANDMARKS = (mpPose.PoseLandmark.LEFT_SHOULDER, mpPose.PoseLandmark.RIGHT_SHOULDER,
+                          mpPose.PoseLandmark.LEFT_HIP, mpPose.PoseLandmark.RIGHT_HIP)
+
+# Landmarks whose visibility makes up the measurement confidence
+MEASURED_LANDMARKS = (11, 12, 23, 24, HEAD_LANDMARK) + FOOT_LANDMARKS
+
+MEASUREMENT_KEYS = ('height', 'shoulder_width', 'chest_circumference', 'waist_circumference')
+
+
+# Functions from Body_Detection.py
+def calculate_distance(x1, y1, x2, y2):
+    return np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+
+def landmarks_to_array(pose_landmarks):
+    """Pack a NormalizedLandmarkList into a (33, 4) float32 array of x, y, z, visibility"""
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+                    dtype=np.float32)
+
+def _as_array(landmarks):
+    # float64 so pixel maths matches the Python floats of the landmark list
+    if not isinstance(landmarks, np.ndarray):
+        landmarks = landmarks_to_array(landmarks)
+    return landmarks.astype(np.float64, copy=False)
+
+def _round(values, ndigits=0):
+    """np.round, except near-ties are settled by Python's round() so results match the scalar code"""
+    scale = 10 ** ndigits
+    scaled = values * scale
+    rounded = np.round(scaled) / scale
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded.flat[i] = round(float(values.flat[i]), ndigits)
+    return rounded
+
+def measure_batch(landmarks, img_width, img_height):
+    """
+    Measure N frames in one call.
+
+    Gives the same numbers as get_body_measurements / measure_height /
+    measurement_confidence applied frame by frame.
+
+    Args:
+        landmarks (np.ndarray): (N, 33, 4) normalised x, y, z, visibility
+
+    Returns:
+        dict: (N,) float arrays for height, shoulder_width, chest_circumference,
+              waist_circumference and confidence; NaN where a frame could not be measured
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    # Pixel coordinates, truncated like int() in the per-landmark code
+    px = np.trunc(landmarks[..., 0] * img_width)
+    py = np.trunc(landmarks[..., 1] * img_height)
+    visibility = landmarks[..., 3]
+
+    left_shoulder, right_shoulder, left_hip, right_hip = SHOULDER_HIP_LANDMARKS
+    visible = (visibility[:, list(SHOULDER_HIP_LANDMARKS)] >= 0.5).all(axis=1)
+    shoulder_width_px = np.sqrt((px[:, right_shoulder] - px[:, left_shoulder])**2 +
+                                (py[:, right_shoulder] - py[:, left_shoulder])**2)
+    waist_width_px = np.abs(px[:, right_hip] - px[:, left_hip])
+    shoulder_width_cm = _round(shoulder_width_px * HEIGHT_CALIBRATION_FACTOR, 1)
+    waist_width_cm = _round(waist_width_px * HEIGHT_CALIBRATION_FACTOR, 1)
+
+    foot_x, foot_y = px[:, FOOT_LANDMARKS[-1]], py[:, FOOT_LANDMARKS[-1]]
+    head_x, head_y = px[:, HEAD_LANDMARK], py[:, HEAD_LANDMARK] + HEAD_OFFSET_PX
+    height = _round(np.sqrt((head_x - foot_x)**2 + (head_y - foot_y)**2) * HEIGHT_CALIBRATION_FACTOR)
+    height[(foot_x == 0) | (foot_y == 0) | (head_x == 0) | (head_y == 0)] = np.nan
+
+    results = {
+        'height': height,
+        'shoulder_width': shoulder_width_cm,
+        'chest_circumference': _round(shoulder_width_cm * CHEST_CIRCUMFERENCE_FACTOR, 1),
+        'waist_circumference': _round(waist_width_cm * WAIST_CIRCUMFERENCE_FACTOR, 1),
+    }
+    for key in ('shoulder_width', 'chest_circumference', 'waist_circumference'):
+        results[key][~visible] = np.nan
+    results['confidence'] = _round(visibility[:, list(MEASURED_LANDMARKS)].mean(axis=1), 3)
+    return results
+
+def get_body_measurements(landmarks, img_width, img_height):
+    """Shoulder width and chest/waist circumference in cm from a NormalizedLandmarkList or (33, 4) array"""
+    if landmarks is None:
+        return None
+
+    try:
+        batch = measure_batch(_as_array(landmarks)[np.newaxis], img_width, img_height)
+        # Shoulders or hips not clearly visible
+        if np.isnan(batch['shoulder_width'][0]):
+            return None
+        return {key: float(batch[key][0]) for key in ('shoulder_width', 'chest_circumference', 'waist_circumference')}
+
+    except Exception as e:
+        print(f"Error calculating body measurements: {e}")
+        return None
+
+def height_keypoints(landmarks, img_width, img_height):
+    """
+    Pixel positions used for the height estimate.
+
+    Returns:
+        tuple: (foot_points, head_point) - both feet in landmark order, and the head point
+    """
+    points = _as_array(landmarks)
+    foot_points = [(int(points[id, 0] * img_width), int(points[id, 1] * img_height)) for id in FOOT_LANDMARKS]
+    head_point = (int(points[HEAD_LANDMARK, 0] * img_width), int(points[HEAD_LANDMARK, 1] * img_height) + HEAD_OFFSET_PX)
+    return foot_points, head_point
+
+def measure_height(foot_points, head_point):
+    """Height in cm from the last foot point to the head point, or None if a coordinate is 0"""
+    cx1, cy1 = foot_points[-1]
+    cx2, cy2 = head_point
+    if not (cx1 and cy1 and cx2 and cy2):
+        return None
+    d = math.sqrt((cx2 - cx1) ** 2 + (cy2 - cy1) ** 2)
+    return round(d * HEIGHT_CALIBRATION_FACTOR)
+
+def measurement_confidence(landmarks):
+    """Mean visibility of the landmarks the measurements are taken from"""
+    return round(float(np.mean(_as_array(landmarks)[list(MEASURED_LANDMARKS), 3])), 3)
+
+def robust_average(values, method='median', trim=0.1):
+    """Median, or mean after cutting `trim` of the values off each end ('trimmed')"""
+    values = np.sort(np.asarray(values, dtype=float))
+    if method == 'trimmed':
+        cut = int(len(values) * trim)
+        if cut and len(values) > 2 * cut:
+            values = values[cut:-cut]
+        return float(values.mean())
+    return float(np.median(values))
+
+
+class MeasurementWindow:
+    """
+    Rolling window of per-frame measurements.
+
+    The window counts as stable once every measurement has min_frames recent
+    values whose spread (std / mean) is at most max_variation and the landmarks
+    were seen with at least min_confidence on average.
+    """
+
+    def __init__(self, size=30, min_frames=10, max_variation=0.02, min_confidence=0.8,
+                 method='median', trim=0.1):
+        self.min_frames = min_frames
+        self.max_variation = max_variation
+        self.min_confidence = min_confidence
+        self.method = method
+        self.trim = trim
+        self.values = {key: deque(maxlen=size) for key in MEASUREMENT_KEYS}
+        self.confidences = deque(maxlen=size)
+
+    def add(self, measurements, confidence):
+        for key in MEASUREMENT_KEYS:
+            value = measurements.get(key)
+            if value:
+                self.values[key].append(float(value))
+        self.confidences.append(confidence)
+
+    def aggregate(self):
+        """Robust average of each measurement in the window (keys without values are left out)"""
+        return {key: round(robust_average(values, self.method, self.trim), 1)
+                for key, values in self.values.items() if values}
+
+    def variation(self):
+        """Largest std / mean over the most recent min_frames values of each measurement"""
+        worst = 0.0
+        for values in self.values.values():
+            recent = np.asarray(list(values)[-self.min_frames:], dtype=float)
+            if len(recent) and recent.mean() > 0:
+                worst = max(worst, float(recent.std() / recent.mean()))
+        return worst
+
+    def is_stable(self):
+        if any(len(values) < self.min_frames for values in self.values.values()):
+            return False
+        recent_confidence = list(self.confidences)[-self.min_frames:]
+        if np.mean(recent_confidence) < self.min_confidence:
+            return False
+        return self.variation() <= self.max_variation
+
+    def progress(self):
+        """0..1 estimate of how close the window is to a stable capture"""
+        if self.is_stable():
+            return 1.0
+        filled = min(len(values) for values in self.values.values()) / self.min_frames
+        return min(filled, 0.99)
+
+    def clear(self):
+        for values in self.values.values():
+            values.clear()
+        self.confidences.clear()
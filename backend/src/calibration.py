@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
+
+REFERENCE_IMAGE_PATHS = ["Ref_image.jpg", "./images/Ref_image.jpg", os.path.join(REPO_ROOT, "Ref_image.jpg")]
+
+
+def find_reference_image(possible_paths=REFERENCE_IMAGE_PATHS):
+    """Return the first reference image path that exists, or None"""
+    for path in possible_paths:
+        if os.path.exists(path):
+            return path
+    print("Error: Reference image not found.")
+    return None
+
+
+class CalibrationCache:
+    """
+    Focal lengths persisted on disk, keyed by reference image and camera setup.
+
+    The key combines the SHA-256 of the reference image, the camera ID, the
+    frame resolution and the known distance/width, so the focal length is only
+    recomputed when one of them changes. File hashes are memoised by
+    (path, mtime, size), so a warm lookup does not even re-read the image.
+    At most max_entries focal lengths are kept; the oldest go first.
+    """
+
+    def __init__(self, path, max_entries=64):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = None
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def focal_length(self, ref_path, camera_id, resolution, known_distance, known_width, compute):
+        """
+        Return the cached focal length, calling compute(ref_path) on a miss.
+
+        Args:
+            resolution (tuple): (width, height) of the camera frames
+            compute (callable): Calculates the focal length from the reference image
+
+        Returns:
+            float: The focal length, or None if compute could not find a face
+        """
+        width, height = resolution
+        key = f"{self._digest(ref_path)}:{camera_id}:{width}x{height}:{known_distance}:{known_width}"
+        with self._lock:
+            entries = self._load()
+            if key in entries:
+                return entries[key]['focal_length']
+
+        focal_length = compute(ref_path)
+        if not focal_length:
+            return None
+
+        with self._lock:
+            entries = self._load()
+            entries[key] = {'focal_length': focal_length, 'reference_image': ref_path}
+            while len(entries) > self.max_entries:
+                del entries[next(iter(entries))]
+            self._save(entries)
+        print(f"Calibrated focal length: {focal_length}")
+        return focal_length
+
+    def _digest(self, path):
+        stat = os.stat(path)
+        file_id = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(file_id)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self._digests[file_id] = digest
+        return digest
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self, entries):
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving calibration cache: {e}")
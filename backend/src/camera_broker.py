@@ -0,0 +1,344 @@
+import threading
+import time
+
+from frame_pipeline import LatestQueue
+from metrics import FRAMES_DROPPED
+from video_source import open_source
+
+
+class CameraSubscription:
+    """One consumer of a SharedCamera. read() mirrors cv2.VideoCapture.read."""
+
+    def __init__(self, camera, timeout=5.0):
+        self.camera = camera
+        self.timeout = timeout
+        self._queue = LatestQueue(1, FRAMES_DROPPED.labels('camera').inc)
+        self.closed = False
+
+    def push(self, frame):
+        self._queue.put(frame)
+
+    def read(self):
+        frame = self._queue.get(timeout=self.timeout)
+        return frame is not None, frame
+
+    def isOpened(self):
+        return not self.closed
+
+    @property
+    def resolution(self):
+        return self.camera.resolution
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.close()
+        self.camera.unsubscribe(self)
+
+    # Lets a subscription stand in wherever a VideoCapture used to be released
+    release = close
+
+
+class SharedCamera:
+    """
+    Owns a single video source and fans its frames out to subscribers.
+
+    device_id is anything open_source accepts: a webcam index, a video file,
+    an image directory or "synthetic".
+
+    The device stays open for idle_timeout seconds after the last subscriber
+    leaves, so a page reload re-attaches without reopening the camera.
+    """
+
+    def __init__(self, device_id, idle_timeout=10.0):
+        self.device_id = device_id
+        self.idle_timeout = idle_timeout
+        self._capture = None
+        self._thread = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.resolution = (0, 0)
+        self._last_detach = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._capture is not None
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self):
+        with self._lock:
+            if self._capture is None:
+                capture = open_source(self.device_id)
+                if not capture.isOpened():
+                    print(f"Error: Could not open {capture!r}")
+                    return None
+                self._capture = capture
+                self.resolution = capture.resolution
+                self._thread = threading.Thread(target=self._capture_loop,
+                                                name=f"camera-{self.device_id}", daemon=True)
+                self._thread.start()
+            subscription = CameraSubscription(self)
+            self._subscribers.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            if not self._subscribers:
+                self._last_detach = time.monotonic()
+
+    def _capture_loop(self):
+        capture = self._capture
+        try:
+            while True:
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                    if not subscribers and time.monotonic() - self._last_detach > self.idle_timeout:
+                        # Decide and give up the device in one locked step: a subscribe() right
+                        # after this opens it afresh instead of joining a loop that is exiting
+                        self._capture = None
+                        self._thread = None
+                        capture.release()
+                        return
+
+                # Keep reading while idle so the driver buffer never holds stale frames
+                success, frame = capture.read()
+                if not success:
+                    print(f"Video source ended or failed: {capture!r}")
+                    break
+
+                # Subscribers draw on their frame, so all but the first get a copy
+                for i, subscription in enumerate(subscribers):
+                    subscription.push(frame if i == 0 else frame.copy())
+        finally:
+            with self._lock:
+                subscribers = list(self._subscribers)
+                self._subscribers = []
+                self._capture = None
+                self._thread = None
+            for subscription in subscribers:
+                subscription.closed = True
+                subscription._queue.close()
+            capture.release()
+
+
+class CameraBroker:
+    """Hands out subscriptions to shared cameras, opening each device at most once."""
+
+    def __init__(self, idle_timeout=10.0):
+        self.idle_timeout = idle_timeout
+        self._cameras = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, device_id=0):
+        with self._lock:
+            camera = self._cameras.get(device_id)
+            if camera is None:
+                camera = SharedCamera(device_id, idle_timeout=self.idle_timeout)
+                self._cameras[device_id] = camera
+        return camera.subscribe()
+
+    @property
+    def open_cameras(self):
+        with self._lock:
+            return sum(1 for camera in self._cameras.values() if camera.is_open)
+
+
+class StreamSubscriber:
+    """Receives the encoded frames of a BroadcastStream; slow readers drop frames."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._queue = LatestQueue(1, FRAMES_DROPPED.labels(f"{stream.pipeline.name}_viewer").inc)
+        self.closed = False
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def push(self, payload):
+        self._queue.put(payload)
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.close()
+        self.stream.detach(self)
+
+
+class BroadcastStream:
+    """Runs one FramePipeline and shares every encoded frame with all subscribers."""
+
+    def __init__(self, hub, key, pipeline):
+        self.hub = hub
+        self.key = key
+        self.pipeline = pipeline
+        self.closed = False
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"broadcast-{key}", daemon=True)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def start(self):
+        self._thread.start()
+
+    def attach(self):
+        with self._lock:
+            if self.closed:
+                return None
+            subscriber = StreamSubscriber(self)
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def detach(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            last_one_left = not self._subscribers
+            if last_one_left:
+                # Late subscribers must start a fresh stream rather than join this one
+                self.closed = True
+        if last_one_left:
+            self.pipeline.stop()
+
+    def _run(self):
+        try:
+            for payload in self.pipeline.frames():
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for subscriber in subscribers:
+                    subscriber.push(payload)
+        finally:
+            self.hub._remove(self)
+            with self._lock:
+                self.closed = True
+                subscribers = list(self._subscribers)
+                self._subscribers = []
+            for subscriber in subscribers:
+                subscriber.closed = True
+                subscriber._queue.close()
+
+
+class StreamHub:
+    """
+    Keeps one running BroadcastStream per key (e.g. 'face', 'body').
+
+    MJPEG and Socket.IO viewers of the same key attach to the same pipeline,
+    so each frame is captured, processed and encoded once.
+    """
+
+    def __init__(self):
+        self._streams = {}
+        self._starting = {}  # key -> Event set once the caller building that stream is done
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, pipeline_factory):
+        """
+        Attach to the stream for key, starting it with pipeline_factory() if needed.
+
+        Returns:
+            StreamSubscriber or None if the pipeline could not be created
+        """
+        while True:
+            with self._lock:
+                stream = self._streams.get(key)
+                subscriber = stream.attach() if stream is not None else None
+                if subscriber is not None:
+                    return subscriber
+                starting = self._starting.get(key)
+                if starting is None:
+                    starting = self._starting[key] = threading.Event()
+                    break
+            # Another caller is starting this stream; attach to it once it is up
+            starting.wait()
+
+        # The factory opens the camera, borrows a pose graph and calibrates, which can take
+        # seconds; only the placeholder is held under the lock, so other streams, stats()
+        # and /metrics carry on meanwhile
+        stream = subscriber = None
+        try:
+            pipeline = pipeline_factory()
+            if pipeline is not None:
+                stream = BroadcastStream(self, key, pipeline)
+                subscriber = stream.attach()
+        finally:
+            with self._lock:
+                if stream is not None:
+                    self._streams[key] = stream
+                del self._starting[key]
+            starting.set()
+        if stream is not None:
+            stream.start()
+        return subscriber
+
+    def frames(self, key, pipeline_factory, timeout=0.5):
+        """Yield encoded frames for key until the stream ends or the caller goes away"""
+        subscriber = self.subscribe(key, pipeline_factory)
+        if subscriber is None:
+            return
+        try:
+            while True:
+                payload = subscriber.get(timeout=timeout)
+                if payload is None:
+                    if subscriber.closed:
+                        break
+                    continue
+                yield payload
+        finally:
+            subscriber.close()
+
+    @property
+    def active_streams(self):
+        with self._lock:
+            return len(self._streams)
+
+    def queue_depths(self):
+        """Frames waiting between pipeline stages, summed per pipeline name"""
+        with self._lock:
+            streams = list(self._streams.values())
+        depths = {}
+        for stream in streams:
+            key = (stream.pipeline.name,)
+            depths[key] = depths.get(key, 0) + stream.pipeline.queue_depth
+        return depths
+
+    def stats(self):
+        """Per-stream viewer count, dropped frames and encoder stats (when the encoder keeps any)"""
+        with self._lock:
+            streams = list(self._streams.values())
+        result = {}
+        for stream in streams:
+            entry = {
+                'subscribers': stream.subscriber_count,
+                'dropped_frames': stream.pipeline.dropped_frames,
+            }
+            if stream.pipeline.metadata is not None:
+                entry['metadata'] = stream.pipeline.metadata()
+            encoder_stats = getattr(stream.pipeline.encode, 'stats', None)
+            if encoder_stats is not None:
+                entry['encoder'] = encoder_stats()
+            result[':'.join(str(part) for part in stream.key) if isinstance(stream.key, tuple) else str(stream.key)] = entry
+        return result
+
+    def _remove(self, stream):
+        with self._lock:
+            if self._streams.get(stream.key) is stream:
+                del self._streams[stream.key]
+
+
+camera_broker = CameraBroker()
+stream_hub = StreamHub()
@@ -2,6 +2,13 @@
 import cv2
 import subprocess
 import os
+
+from video_source import open_source
+
+# CAMERA_SOURCE picks the input (webcam index, video file, image directory or "synthetic");
+# HEADLESS=1 skips the preview windows so the loop runs on a box without a display
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', 0)
+HEADLESS = os.environ.get('HEADLESS') == '1'
 # distance from camera to object(face) measured
 # centimeter
 Known_distance = 300
@@ -91,18 +98,21 @@ Focal_length_found = Focal_Length_Finder(
 print(Focal_length_found)
 
 # show the reference image
-cv2.imshow("ref_image", ref_image)
+if not HEADLESS:
+    cv2.imshow("ref_image", ref_image)
 
 # initialize the camera object so that we
 # can get frame from it
-cap = cv2.VideoCapture(0)
+cap = open_source(CAMERA_SOURCE)
 
 # looping through frame, incoming from
 # camera/video
 while True:
 
     # reading the frame from camera
-    _, frame = cap.read()
+    success, frame = cap.read()
+    if not success:
+        break
 
     # calling face_data function to find
     # the width of face(pixels) in the frame
@@ -139,6 +149,8 @@ while True:
         fonts, 0.6, GREEN, 2)
 
     # show the frame on the screen
+    if HEADLESS:
+        continue
     cv2.imshow("frame", frame)
 
     # quit the program if you press 'q' on keyboard
@@ -0,0 +1,88 @@
+"""
+Face-distance helpers shared by the apps, the benchmark and the scripts.
+
+Importing this module only loads the Haar cascade - no database, Flask app
+or background threads - so tools can use the measurement code on its own.
+"""
+import os
+
+import cv2
+
+from calibration import find_reference_image
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+cascade_path = os.path.join(os.path.dirname(BASE_DIR), "config", "haarcascade_frontalface_default.xml")
+print(f"Loading cascade classifier from: {cascade_path}")  # Debug print
+
+if not os.path.exists(cascade_path):
+    raise FileNotFoundError(f"Cascade classifier file not found at: {cascade_path}")
+
+face_detector = cv2.CascadeClassifier(cascade_path)
+if face_detector.empty():
+    raise ValueError("Error loading cascade classifier")
+
+# Constants for face detection
+Known_distance = 230  # centimeter
+Known_width = 14.3    # centimeter
+GREEN = (0, 255, 0)
+RED = (0, 0, 255)
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+BLUE = (255, 0, 0)
+
+# Face width calculation function
+def face_data(image):
+    face_width = 0
+    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    faces = face_detector.detectMultiScale(gray_image, 1.3, 5)
+    
+    for (x, y, h, w) in faces:
+        cv2.rectangle(image, (x, y), (x+w, y+h), GREEN, 2)
+        face_width = w
+        
+    return face_width
+
+# Focal length finder function
+def Focal_Length_Finder(measured_distance, real_width, width_in_rf_image):
+
+    # finding the focal length
+    focal_length = (width_in_rf_image * measured_distance) / real_width
+    return focal_length
+
+# Distance estimation function
+def Distance_finder(Focal_Length, real_face_width, face_width_in_frame):
+
+    distance = (real_face_width * Focal_Length)/face_width_in_frame
+
+    # return the distance
+    return distance
+
+# Distance guidance shared by the MJPEG stream and browser capture
+def face_distance(Focal_Length, face_box):
+    """Rounded distance in cm to the face in an (x, y, w, h) box"""
+    x, y, w, h = face_box
+    return round(Distance_finder(Focal_Length, Known_width, w))
+
+def distance_status(Distance):
+    # Correct distance for measurement is 290-310 cm
+    if Distance in range(290, 310):
+        return 'perfect'
+    elif Distance < 290:
+        return 'too_close'
+    return 'too_far'
+
+# Calibration functions
+def compute_focal_length(ref_path):
+    ref_image = cv2.imread(ref_path)
+    if ref_image is None:
+        print(f"Error: Could not read reference image {ref_path}")
+        return None
+    
+    # Find face width in reference image
+    ref_image_face_width = face_data(ref_image)
+    if ref_image_face_width == 0:
+        print("Error: No face found in reference image")
+        return None
+    
+    # Calculate focal length
+    return Focal_Length_Finder(Known_distance, Known_width, ref_image_face_width)
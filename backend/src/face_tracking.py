@@ -0,0 +1,82 @@
+import cv2
+
+
+def _largest(faces):
+    # The closest face is the one the distance guidance is meant for
+    return max(faces, key=lambda box: box[2] * box[3]) if len(faces) else None
+
+
+class AdaptiveFaceDetector:
+    """
+    Haar face detection that avoids scanning the full-resolution frame every time.
+
+    - Full scans run on a copy downscaled to at most max_scan_width pixels wide.
+    - While a face is tracked, only a window around the last box is searched
+      at full resolution, restricted to face sizes close to the last one.
+    - A full scan is forced every rescan_interval frames and whenever the
+      tracked face is lost.
+
+    Boxes are always returned in full-resolution pixels, so widths can go
+    straight into Distance_finder.
+    """
+
+    def __init__(self, classifier, max_scan_width=640, roi_margin=0.5, rescan_interval=15,
+                 scale_factor=1.3, min_neighbors=5):
+        self.classifier = classifier
+        self.max_scan_width = max_scan_width
+        self.roi_margin = roi_margin
+        self.rescan_interval = rescan_interval
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.last_box = None
+        self.frames_since_scan = 0
+
+    def detect(self, image):
+        """Return the (x, y, w, h) box of the main face in image, or None"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        box = None
+        if self.last_box is not None and self.frames_since_scan < self.rescan_interval:
+            box = self._search_window(gray, self.last_box)
+            self.frames_since_scan += 1
+        if box is None:
+            box = self._search_full(gray)
+            self.frames_since_scan = 0
+
+        self.last_box = box
+        return box
+
+    def reset(self):
+        self.last_box = None
+        self.frames_since_scan = 0
+
+    def _search_full(self, gray):
+        scale = min(1.0, self.max_scan_width / gray.shape[1])
+        if scale < 1.0:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+        box = _largest(self.classifier.detectMultiScale(small, self.scale_factor, self.min_neighbors))
+        if box is None:
+            return None
+        # Map back to full-resolution pixels
+        return tuple(int(round(v / scale)) for v in box)
+
+    def _search_window(self, gray, last_box):
+        x, y, w, h = last_box
+        margin_x, margin_y = int(w * self.roi_margin), int(h * self.roi_margin)
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(gray.shape[1], x + w + margin_x), min(gray.shape[0], y + h + margin_y)
+        window = gray[y0:y1, x0:x1]
+        if window.size == 0:
+            return None
+
+        # A face does not change size much between frames
+        faces = self.classifier.detectMultiScale(
+            window, self.scale_factor, self.min_neighbors,
+            minSize=(int(w * 0.6), int(h * 0.6)), maxSize=(int(w * 1.6), int(h * 1.6)))
+        box = _largest(faces)
+        if box is None:
+            return None
+        bx, by, bw, bh = (int(v) for v in box)
+        return (bx + x0, by + y0, bw, bh)
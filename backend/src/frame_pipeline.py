@@ -0,0 +1,222 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import FRAME_STAGE_SECONDS, FRAMES_DROPPED
+
+STAGES = ('capture', 'inference', 'annotate', 'encode')
+
+
+class LatestQueue:
+    """
+    Bounded queue where the newest item wins: a full queue drops its oldest item.
+
+    on_drop, if given, is called for every dropped item (e.g. a metrics counter's inc).
+    """
+
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                # Stale frame - throw it away instead of making the consumer catch up
+                self._items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop()
+            self._items.append(item)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout=None):
+        """Return the next item, or None on timeout or once the queue is closed and empty."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    return None
+                if deadline is None:
+                    self._cond.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+            return self._items.popleft()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+def encode_jpeg(image):
+    """Encode a BGR image as JPEG bytes, or return None if encoding fails"""
+    ret, buffer = cv2.imencode('.jpg', image)
+    if not ret:
+        print("Error: Could not encode frame")
+        return None
+    return buffer.tobytes()
+
+
+def mjpeg_chunk(jpeg_bytes):
+    """Wrap JPEG bytes as one part of a multipart/x-mixed-replace response"""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+
+
+class FramePipeline:
+    """
+    Runs capture -> inference -> annotate -> encode on separate threads.
+
+    Stages are connected by LatestQueue instances, so a slow stage makes the
+    faster ones drop stale frames instead of building up latency. Each
+    stage's time per frame and the dropped frames are recorded in the
+    metrics registry under the pipeline's name.
+
+    Args:
+        read_frame (callable): Returns (success, frame), like VideoCapture.read
+        infer (callable): infer(frame) -> result (face width, pose result, ...)
+        annotate (callable): annotate(frame, result) -> image to encode
+        encode (callable, optional): encode(image) -> bytes or None
+        should_stop (callable, optional): Checked after every capture; True ends the stream
+        release (callable, optional): Called from the capture thread when it exits
+        on_finished (callable, optional): Called by frames() once every stage thread has exited
+        metadata (callable, optional): Returns a dict describing the stream (e.g. its quality level)
+        queue_size (int): Capacity of each inter-stage queue
+    """
+
+    def __init__(self, read_frame, infer, annotate, encode=encode_jpeg,
+                 should_stop=None, release=None, on_finished=None, metadata=None, queue_size=1, name='pipeline'):
+        self.read_frame = read_frame
+        self.infer = infer
+        self.annotate = annotate
+        self.encode = encode
+        self.should_stop = should_stop
+        self.release = release
+        self.on_finished = on_finished
+        self.metadata = metadata
+        self.name = name
+
+        self._stop_event = threading.Event()
+        on_drop = FRAMES_DROPPED.labels(name).inc
+        self._infer_queue = LatestQueue(queue_size, on_drop)
+        self._annotate_queue = LatestQueue(queue_size, on_drop)
+        self._encode_queue = LatestQueue(queue_size, on_drop)
+        self._output_queue = LatestQueue(queue_size, on_drop)
+        self._stage_seconds = {stage: FRAME_STAGE_SECONDS.labels(name, stage) for stage in STAGES}
+        self._threads = []
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._stop_event.is_set()
+
+    @property
+    def dropped_frames(self):
+        return sum(q.dropped for q in (self._infer_queue, self._annotate_queue,
+                                       self._encode_queue, self._output_queue))
+
+    @property
+    def queue_depth(self):
+        """Frames waiting between stages right now"""
+        return sum(len(q) for q in (self._infer_queue, self._annotate_queue,
+                                    self._encode_queue, self._output_queue))
+
+    def start(self):
+        if self._threads:
+            return
+        stages = [
+            ('capture', self._capture_loop),
+            ('inference', self._stage_loop('inference', self._infer_queue, self._annotate_queue, self._run_infer)),
+            ('annotate', self._stage_loop('annotate', self._annotate_queue, self._encode_queue, self._run_annotate)),
+            ('encode', self._stage_loop('encode', self._encode_queue, self._output_queue, self.encode)),
+        ]
+        for stage_name, target in stages:
+            thread = threading.Thread(target=target, name=f"{self.name}-{stage_name}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        for q in (self._infer_queue, self._annotate_queue, self._encode_queue, self._output_queue):
+            q.close()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def frames(self, timeout=0.5):
+        """Start the pipeline and yield encoded frames until it stops"""
+        self.start()
+        try:
+            while True:
+                payload = self._output_queue.get(timeout=timeout)
+                if payload is None:
+                    if self._stop_event.is_set():
+                        break
+                    continue
+                yield payload
+        finally:
+            self.stop()
+            self.join()
+            if self.on_finished is not None:
+                self.on_finished()
+
+    def _capture_loop(self):
+        capture_seconds = self._stage_seconds['capture']
+        try:
+            while not self._stop_event.is_set():
+                with capture_seconds.time():
+                    success, frame = self.read_frame()
+                if not success:
+                    print("Error: Could not read frame")
+                    break
+                if self.should_stop is not None and self.should_stop():
+                    break
+                self._infer_queue.put(frame)
+        except Exception as e:
+            print(f"Error in {self.name} capture: {e}")
+        finally:
+            self.stop()
+            if self.release is not None:
+                self.release()
+
+    def _run_infer(self, frame):
+        return frame, self.infer(frame)
+
+    def _run_annotate(self, item):
+        frame, result = item
+        return self.annotate(frame, result)
+
+    def _stage_loop(self, stage, source, sink, work):
+        stage_seconds = self._stage_seconds[stage]
+
+        def loop():
+            while not self._stop_event.is_set():
+                item = source.get(timeout=0.5)
+                if item is None:
+                    continue
+                try:
+                    with stage_seconds.time():
+                        output = work(item)
+                except Exception as e:
+                    print(f"Error in frame processing ({self.name}): {e}")
+                    continue
+                if output is not None:
+                    sink.put(output)
+        return loop
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+
+REPORT_FIELDS = ('timestamp', 'height', 'shoulder_width', 'chest_circumference', 'waist_circumference')
+
+
+def render_measurement_pdf(measurement_data):
+    """
+    Render the measurement results PDF in memory.
+
+    Returns:
+        bytes: The PDF document
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+
+    # Build content
+    content = []
+    content.append(Paragraph("Measurement Results", styles['Heading1']))
+
+    # Create table with measurements
+    data = [
+        ["Measurement", "Value (cm)"],
+        ["Height", f"{measurement_data['height']}"],
+        ["Shoulder Width", f"{measurement_data['shoulder_width']}"],
+        ["Chest Circumference", f"{measurement_data['chest_circumference']}"],
+        ["Waist Circumference", f"{measurement_data['waist_circumference']}"]
+    ]
+
+    table = Table(data)
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (1, 0), colors.whitesmoke)
+    ]))
+
+    content.append(table)
+    doc.build(content)
+
+    return buffer.getvalue()
+
+
+def content_hash(measurement_data):
+    """Short hash of the values a report shows; also usable as the download's ETag"""
+    values = json.dumps([measurement_data.get(field) for field in REPORT_FIELDS], default=str)
+    return hashlib.sha256(values.encode()).hexdigest()[:16]
+
+
+class ReportCache:
+    """
+    LRU cache of rendered measurement PDFs.
+
+    Entries are keyed by measurement ID and content hash, so a download, an
+    email attachment and any resend of the same measurement share one
+    render, and a row whose values changed is rendered again.
+
+    Args:
+        max_entries (int): Reports kept; the least recently used go first
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, measurement_data):
+        """
+        Returns:
+            tuple: (PDF bytes, content hash)
+        """
+        digest = content_hash(measurement_data)
+        key = (measurement_data.get('id'), digest)
+        with self._lock:
+            pdf = self._reports.get(key)
+            if pdf is not None:
+                self._reports.move_to_end(key)
+                return pdf, digest
+
+        # Render outside the lock; two first requests for one report may both render it
+        pdf = render_measurement_pdf(measurement_data)
+        with self._lock:
+            self._reports[key] = pdf
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_entries:
+                self._reports.popitem(last=False)
+        return pdf, digest
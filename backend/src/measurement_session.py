@@ -0,0 +1,376 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import mediapipe as mp
+
+from body_measurement import MeasurementWindow
+
+mpPose = mp.solutions.pose
+
+
+class PosePool:
+    """
+    Bounded pool of mpPose.Pose graphs.
+
+    A Pose graph is not safe to share between streams, so each measurement
+    session borrows its own. The pool never holds more than size graphs
+    (default: one per CPU core) and creates them lazily. Graphs are built for
+    one model_complexity; when the pool is full, an idle graph of another
+    complexity is closed to make room for the one asked for.
+    """
+
+    def __init__(self, size=None, factory=None):
+        self.size = size or os.cpu_count() or 1
+        self.factory = factory or mpPose.Pose
+        self._free = []  # (model_complexity, pose), oldest first
+        self._complexities = {}  # id(pose) -> model_complexity of graphs handed out
+        self._created = 0
+        self._cond = threading.Condition()
+
+    @property
+    def in_use(self):
+        with self._cond:
+            return self._created - len(self._free)
+
+    def acquire(self, timeout=None, model_complexity=1):
+        """Borrow a Pose graph, or return None if none frees up within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stale = None
+        with self._cond:
+            while True:
+                for i, (complexity, pose) in enumerate(self._free):
+                    if complexity == model_complexity:
+                        del self._free[i]
+                        self._complexities[id(pose)] = complexity
+                        return pose
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                if self._free:
+                    # Rebuild an idle graph instead of waiting for one of the right complexity
+                    stale = self._free.pop(0)[1]
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+        if stale is not None:
+            stale.close()
+        try:
+            pose = self.factory(model_complexity=model_complexity)
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._complexities[id(pose)] = model_complexity
+        return pose
+
+    def swap(self, pose, model_complexity):
+        """
+        Exchange a borrowed graph for one of another model_complexity.
+
+        Never waits for other borrowers: an idle graph of that complexity is
+        taken if there is one, otherwise a new one is built and takes the old
+        one's place (or joins the pool, if it has room). The caller keeps the
+        old graph until then, so if building raises it still has a working one.
+
+        Returns:
+            The new graph; raises whatever the factory raises
+        """
+        with self._cond:
+            for i, (complexity, free) in enumerate(self._free):
+                if complexity == model_complexity:
+                    del self._free[i]
+                    self._complexities[id(free)] = complexity
+                    self._free.append((self._complexities.pop(id(pose)), pose))
+                    self._cond.notify()
+                    return free
+            grow = self._created < self.size
+            if grow:
+                self._created += 1
+        try:
+            replacement = self.factory(model_complexity=model_complexity)
+        except Exception:
+            if grow:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+            raise
+        with self._cond:
+            self._complexities[id(replacement)] = model_complexity
+            previous = self._complexities.pop(id(pose))
+            if grow:
+                self._free.append((previous, pose))
+                self._cond.notify()
+                pose = None
+        if pose is not None:
+            # A full pool holds one graph more only while the replacement is built
+            pose.close()
+        return replacement
+
+    def release(self, pose):
+        if pose is not None:
+            with self._cond:
+                self._free.append((self._complexities.pop(id(pose)), pose))
+                self._cond.notify()
+
+
+class PoseLease:
+    """
+    The pose graph one pipeline of a session measures with.
+
+    Each body pipeline (MJPEG stream or browser capture client) takes its own
+    lease and releases it when it ends, so two pipelines of one session never
+    drive the same graph, and a pipeline that finishes late cannot hand back
+    the graph a restarted one is using. With a pose_service the lease holds
+    no graph; its frames go to the worker process pinned to its stream ID,
+    which keeps a graph for this lease alone.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(self, session, pose):
+        self.session = session
+        self.stream_id = f"{session.session_id}:{next(self._ids)}"
+        self.model_complexity = session.model_complexity
+        self._pose = pose
+        self._released = False
+        self._lock = threading.Lock()
+
+    def process(self, img_rgb, model_complexity=None):
+        """Run pose on a frame; a different model_complexity swaps the lease's graph first"""
+        service = self.session.pose_service
+        if service is not None and service.unavailable_complexities:
+            # Workers fall back on their own; the session's set is what the governor reads
+            self.session.unavailable_complexities.update(service.unavailable_complexities)
+        if (model_complexity is not None and model_complexity != self.model_complexity
+                and model_complexity not in self.session.unavailable_complexities):
+            self._switch_model_complexity(model_complexity)
+        if service is not None:
+            return service.process(img_rgb, model_complexity=self.model_complexity, stream_id=self.stream_id)
+        return self._pose.process(img_rgb)
+
+    def _switch_model_complexity(self, model_complexity):
+        # Called from the thread that runs process, so the old graph is idle.
+        # It is only given up once the replacement is in hand.
+        with self._lock:
+            if self._released:
+                return
+            if self._pose is not None:
+                try:
+                    self._pose = self.session.pose_pool.swap(self._pose, model_complexity)
+                except Exception as e:
+                    # MediaPipe downloads the lite/heavy models on first use
+                    print(f"Pose model_complexity {model_complexity} unavailable: {e}")
+                    self.session.unavailable_complexities.add(model_complexity)
+                    return
+            self.model_complexity = model_complexity
+        # New pipelines of the session start where this one settled
+        self.session.model_complexity = self.model_complexity
+
+    def release(self):
+        """Hand the graph back to the pool; safe to call more than once"""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+            pose, self._pose = self._pose, None
+        if self.session.pose_service is not None:
+            self.session.pose_service.release(self.stream_id)
+        self.session.pose_pool.release(pose)
+        self.session._forget_lease(self)
+
+
+class MeasurementSession:
+    """
+    State of one measurement booth: mode flags, countdown, measurements and pose graph.
+
+    Pose graphs belong to the pipelines, not to the session: each pipeline
+    borrows a PoseLease with acquire_pose() and releases it when it ends.
+
+    The countdown and measurement fields are only touched from the annotate
+    thread of the session's body pipeline (or the worker of its browser
+    capture client), plus the resets done by the routes.
+    """
+
+    def __init__(self, session_id, pose_pool, camera_index=0, countdown_duration=8, pose_service=None,
+                 window_options=None):
+        self.session_id = session_id
+        self.pose_pool = pose_pool
+        self.pose_service = pose_service
+        self.camera_index = camera_index
+        self.countdown_duration = countdown_duration  # seconds - upper bound, stable frames capture earlier
+        self.window_options = window_options or {}
+        self.button_clicked = False
+        self.is_measuring_height = False
+        self.last_seen = time.time()
+        self.model_complexity = 1
+        self.unavailable_complexities = set()  # Models that failed to load (e.g. no network to download them)
+        self._leases = set()
+        self._pose_lock = threading.Lock()
+        self.reset_measurement()
+
+    def reset_measurement(self):
+        self.measurements_captured = False
+        self.countdown_started = False
+        self.start_time = time.time()
+        self.current_measurements = {
+            "height": 0,
+            "shoulder_width": 0,
+            "chest_circumference": 0,
+            "waist_circumference": 0,
+            "timestamp": "",
+        }
+        self.window = MeasurementWindow(**self.window_options)
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    def start_face_detection(self):
+        self.button_clicked = False
+        self.is_measuring_height = False
+
+    def start_body_measurement(self):
+        self.is_measuring_height = True
+        self.reset_measurement()
+
+    @property
+    def face_detection_done(self):
+        return self.button_clicked or self.is_measuring_height
+
+    def acquire_pose(self, timeout=None):
+        """
+        Borrow a pose graph for one pipeline of this session.
+
+        Returns:
+            PoseLease or None if no graph frees up within timeout
+        """
+        pose = None
+        if self.pose_service is None:
+            pose = self.pose_pool.acquire(timeout=timeout, model_complexity=self.model_complexity)
+            if pose is None:
+                return None
+        lease = PoseLease(self, pose)
+        with self._pose_lock:
+            self._leases.add(lease)
+        return lease
+
+    def _forget_lease(self, lease):
+        with self._pose_lock:
+            self._leases.discard(lease)
+
+    def remaining_time(self):
+        """Start the countdown on first call and return the whole seconds left"""
+        if not self.countdown_started:
+            self.countdown_started = True
+            self.start_time = time.time()
+        elapsed_time = time.time() - self.start_time
+        return max(0, self.countdown_duration - int(elapsed_time))
+
+    def progress(self):
+        """Countdown and stability as pushed to the session's pages; unlike remaining_time() it starts nothing"""
+        remaining_time = self.countdown_duration
+        if self.countdown_started:
+            remaining_time = max(0, self.countdown_duration - int(time.time() - self.start_time))
+        return {
+            'remaining_time': remaining_time,
+            'stability': self.window.progress(),
+            'captured': self.measurements_captured,
+        }
+
+    def add_frame(self, measurements, confidence):
+        """Feed one frame's measurements into the stability window"""
+        self.window.add(measurements, confidence)
+
+    def should_capture(self, remaining_time):
+        """Capture as soon as the window is stable, at the latest when the countdown runs out"""
+        return remaining_time == 0 or self.window.is_stable()
+
+    def capture(self):
+        """
+        Freeze the measurements and mark them captured.
+
+        The robust window average replaces the last frame's values, so single
+        outlier frames do not end up in the database.
+
+        Returns:
+            dict: The row to store
+        """
+        self.current_measurements.update(self.window.aggregate())
+        self.current_measurements["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.measurements_captured = True
+        return dict(self.current_measurements)
+
+    def close(self):
+        # Running pipelines touch the session every frame, so an expired session has none left
+        with self._pose_lock:
+            leases = list(self._leases)
+        for lease in leases:
+            lease.release()
+
+
+class SessionManager:
+    """Creates, looks up and expires MeasurementSession objects by ID."""
+
+    def __init__(self, pose_pool, idle_timeout=1800, camera_index=0, pose_service=None):
+        self.pose_pool = pose_pool
+        self.pose_service = pose_service
+        self.idle_timeout = idle_timeout
+        self.camera_index = camera_index
+        self._sessions = {}
+        self._close_callbacks = []
+        self._lock = threading.Lock()
+
+    def on_close(self, callback):
+        """Call callback(session_id) whenever a session is closed or expires"""
+        self._close_callbacks.append(callback)
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id, camera_index=None):
+        """Return the session for session_id, creating it if needed"""
+        self.expire_idle()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = MeasurementSession(
+                    session_id, self.pose_pool,
+                    camera_index=self.camera_index if camera_index is None else camera_index,
+                    pose_service=self.pose_service)
+                self._sessions[session_id] = session
+            elif camera_index is not None:
+                session.camera_index = camera_index
+        session.touch()
+        return session
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._close(session)
+
+    def expire_idle(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if now - s.last_seen > self.idle_timeout]
+            sessions = [self._sessions.pop(sid) for sid in expired]
+        for session in sessions:
+            self._close(session)
+
+    def _close(self, session):
+        session.close()
+        for callback in self._close_callbacks:
+            callback(session.session_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
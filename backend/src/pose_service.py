@@ -0,0 +1,177 @@
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from mediapipe.framework.formats import landmark_pb2
+
+import pose_worker
+
+NUM_LANDMARKS = 33
+
+# Mirrors the attribute of MediaPipe's pose result that the stream code reads
+PoseResult = namedtuple('PoseResult', ['pose_landmarks'])
+
+
+def landmarks_from_array(array):
+    """Rebuild a NormalizedLandmarkList (for drawing and get_body_measurements) from an array"""
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in array:
+        landmark_list.landmark.add(x=float(x), y=float(y), z=float(z), visibility=float(visibility))
+    return landmark_list
+
+
+class PoseService:
+    """
+    Pose inference on a pool of worker processes, each holding a warm mpPose.Pose.
+
+    pose.process keeps the GIL for most of its run, so threads cannot scale it
+    across cores. Each stream is pinned to one worker (the one serving the
+    fewest streams), which keeps graphs of that stream only, so video-mode
+    tracking and smoothing stay per person. Frames without a stream ID go to
+    the shortest queue and run through a static-image graph. Results come
+    back as compact (33, 4) landmark arrays; release(stream_id) frees a
+    stream's graphs when it ends.
+    """
+
+    def __init__(self, num_workers=None, pose_options=None):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.pose_options = pose_options or {}
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._task_queues = []
+        self._result_queue = None
+        self._pending = {}
+        self._depths = [0] * self.num_workers
+        self._stream_workers = {}  # stream_id -> worker_id
+        self._stream_counts = [0] * self.num_workers
+        self.unavailable_complexities = set()  # Reported by workers that could not load the model
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._collector = None
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._result_queue = self._context.Queue()
+            # Spawned children re-run the parent's __main__; with the app as __main__ that
+            # would migrate the database, build the Flask app and start its threads in every
+            # worker. While they start, the side-effect-free worker module stands in for it.
+            main_module = sys.modules['__main__']
+            sys.modules['__main__'] = pose_worker
+            try:
+                for worker_id in range(self.num_workers):
+                    task_queue = self._context.Queue()
+                    worker = self._context.Process(
+                        target=pose_worker.pose_worker,
+                        args=(worker_id, task_queue, self._result_queue, self.pose_options),
+                        name=f"pose-worker-{worker_id}",
+                        daemon=True,
+                    )
+                    worker.start()
+                    self._task_queues.append(task_queue)
+                    self._workers.append(worker)
+            finally:
+                sys.modules['__main__'] = main_module
+            self._collector = threading.Thread(target=self._collect_results, name='pose-collector', daemon=True)
+            self._collector.start()
+            self._started = True
+            print(f"Started pose service with {self.num_workers} workers")
+
+    def submit(self, image_rgb, model_complexity=None, stream_id=None):
+        """
+        Queue a frame for inference.
+
+        Args:
+            model_complexity (int, optional): Overrides the model_complexity in pose_options
+            stream_id (str, optional): Stream the frame belongs to; its frames always go to one worker
+
+        Returns:
+            Future: Resolves to a (33, 4) float32 array, or None if no pose was found
+        """
+        self.start()
+        future = Future()
+        with self._lock:
+            if stream_id is None:
+                worker_id = min(range(self.num_workers), key=self._depths.__getitem__)
+            else:
+                worker_id = self._stream_workers.get(stream_id)
+                if worker_id is None:
+                    worker_id = min(range(self.num_workers),
+                                    key=lambda i: (self._stream_counts[i], self._depths[i]))
+                    self._stream_workers[stream_id] = worker_id
+                    self._stream_counts[worker_id] += 1
+            task_id = next(self._task_ids)
+            self._pending[task_id] = future
+            self._depths[worker_id] += 1
+        self._task_queues[worker_id].put(('process', task_id, stream_id, image_rgb, model_complexity))
+        return future
+
+    def release(self, stream_id):
+        """Close the graphs of a stream that has ended"""
+        with self._lock:
+            worker_id = self._stream_workers.pop(stream_id, None)
+            if worker_id is None or not self._started:
+                return
+            self._stream_counts[worker_id] -= 1
+        self._task_queues[worker_id].put(('release', stream_id))
+
+    def process(self, image_rgb, timeout=2.0, model_complexity=None, stream_id=None):
+        """Drop-in for pose.process: returns a PoseResult whose pose_landmarks may be None"""
+        try:
+            landmarks = self.submit(image_rgb, model_complexity, stream_id).result(timeout=timeout)
+        except FutureTimeoutError:
+            # Workers are still warming up or overloaded - treat it as "no pose"
+            print(f"Pose service did not answer within {timeout}s")
+            landmarks = None
+        return PoseResult(landmarks_from_array(landmarks) if landmarks is not None else None)
+
+    def queue_depths(self):
+        """Frames submitted to each worker that have not come back yet"""
+        with self._lock:
+            return list(self._depths)
+
+    def stats(self):
+        return {
+            'workers': self.num_workers,
+            'alive': sum(1 for worker in self._workers if worker.is_alive()),
+            'queue_depths': self.queue_depths(),
+            'streams': len(self._stream_workers),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._result_queue.put(None)
+        self._collector.join(timeout=5)
+
+    def _collect_results(self):
+        while True:
+            try:
+                message = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            task_id, worker_id, landmarks = message
+            if task_id == 'ready':
+                continue
+            if task_id == 'unavailable':
+                self.unavailable_complexities.add(landmarks)
+                continue
+            with self._lock:
+                future = self._pending.pop(task_id, None)
+                self._depths[worker_id] -= 1
+            if future is not None:
+                future.set_result(landmarks)
@@ -0,0 +1,76 @@
+"""
+Entry point of the PoseService worker processes.
+
+Spawned workers import the module of their target, so this one imports
+only MediaPipe and the landmark helpers - never app.py or app_supabase.py,
+whose import migrates the database, builds the Flask app and starts
+background threads.
+"""
+import mediapipe as mp
+
+from body_measurement import landmarks_to_array
+
+
+def _create_pose(stream_id, pose_options, model_complexity):
+    options = dict(pose_options, model_complexity=model_complexity)
+    if stream_id is None:
+        # Frames without a stream may come from anyone, so nothing may carry over between them
+        options.update(static_image_mode=True, smooth_landmarks=False)
+    return mp.solutions.pose.Pose(**options)
+
+
+def pose_worker(worker_id, task_queue, result_queue, pose_options):
+    """
+    Serve pose tasks until a None task arrives.
+
+    Tasks:
+        ('process', task_id, stream_id, image_rgb, model_complexity)
+        ('release', stream_id) - close that stream's graphs
+
+    Besides the task results, ('ready', worker_id, None) is sent once at start
+    and ('unavailable', worker_id, model_complexity) when a model fails to load.
+
+    Each stream gets graphs of its own (one per model_complexity), so the
+    tracking and landmark smoothing of video mode never mix two streams.
+    """
+    default_complexity = pose_options.get('model_complexity', 1)
+    poses = {}  # (stream_id, model_complexity) -> Pose
+    unavailable = set()
+    result_queue.put(('ready', worker_id, None))
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        if task[0] == 'release':
+            for key in [key for key in poses if key[0] == task[1]]:
+                poses.pop(key).close()
+            continue
+
+        _, task_id, stream_id, image_rgb, model_complexity = task
+        try:
+            model_complexity = default_complexity if model_complexity is None else model_complexity
+            if model_complexity in unavailable:
+                model_complexity = default_complexity
+            pose = poses.get((stream_id, model_complexity))
+            if pose is None:
+                try:
+                    pose = _create_pose(stream_id, pose_options, model_complexity)
+                except Exception as e:
+                    if model_complexity == default_complexity:
+                        raise
+                    # MediaPipe downloads the lite/heavy models on first use
+                    print(f"Pose worker {worker_id}: model_complexity {model_complexity} unavailable: {e}")
+                    unavailable.add(model_complexity)
+                    result_queue.put(('unavailable', worker_id, model_complexity))
+                    model_complexity = default_complexity
+                    pose = poses.get((stream_id, model_complexity)) or _create_pose(
+                        stream_id, pose_options, model_complexity)
+                poses[(stream_id, model_complexity)] = pose
+            result = pose.process(image_rgb)
+            landmarks = landmarks_to_array(result.pose_landmarks) if result.pose_landmarks else None
+            result_queue.put((task_id, worker_id, landmarks))
+        except Exception as e:
+            print(f"Error in pose worker {worker_id}: {e}")
+            result_queue.put((task_id, worker_id, None))
+    for pose in poses.values():
+        pose.close()
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import cv2
+
+# Inference quality levels, best first. max_width 0 keeps the camera resolution.
+QUALITY_LEVELS = (
+    {'name': 'full', 'max_width': 0, 'model_complexity': 2},
+    {'name': 'high', 'max_width': 0, 'model_complexity': 1},
+    {'name': 'medium', 'max_width': 640, 'model_complexity': 1},
+    {'name': 'low', 'max_width': 480, 'model_complexity': 0},
+    {'name': 'minimum', 'max_width': 320, 'model_complexity': 0},
+)
+DEFAULT_LEVEL = 1  # What the streams used before: full resolution, model_complexity 1
+
+
+def scale_to_width(image, max_width):
+    """Downscale image to max_width pixels wide (0 or a narrower image: unchanged)"""
+    height, width = image.shape[:2]
+    if not max_width or width <= max_width:
+        return image
+    return cv2.resize(image, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+
+
+class QualityGovernor:
+    """
+    Picks the pose inference level from the measured stream FPS.
+
+    The FPS is smoothed, then compared against target_fps with a dead band:
+    below target * down_ratio for down_seconds steps one level down, above
+    target * up_ratio for up_seconds steps one level up. Every change restarts
+    both timers, so the new level gets time to settle before it is judged.
+
+    Levels whose model_complexity is in unavailable (a set the pose side
+    fills when a model fails to load) are skipped, and a level that turns
+    out to be unavailable is left for the nearest one that works, so the
+    governor never sits on, or reports, a model that is not running.
+
+    update() is called from the annotate thread; level is read from the
+    inference thread.
+    """
+
+    def __init__(self, target_fps=15, levels=QUALITY_LEVELS, start_level=DEFAULT_LEVEL,
+                 down_ratio=0.85, up_ratio=1.3, down_seconds=1.0, up_seconds=3.0, smoothing=0.2,
+                 unavailable=None):
+        self.target_fps = target_fps
+        self.levels = levels
+        self.unavailable = unavailable if unavailable is not None else set()
+        self.down_ratio = down_ratio
+        self.up_ratio = up_ratio
+        self.down_seconds = down_seconds
+        self.up_seconds = up_seconds
+        self.smoothing = smoothing
+        self.changes = 0
+        self._index = min(max(start_level, 0), len(levels) - 1)
+        self._fps = None
+        self._below_since = None
+        self._above_since = None
+        self._lock = threading.Lock()
+
+    @property
+    def level(self):
+        with self._lock:
+            self._settle()
+            return self.levels[self._index]
+
+    def update(self, fps, now=None):
+        """
+        Feed one FPS sample.
+
+        Returns:
+            bool: True if the level changed
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._settle()
+            self._fps = fps if self._fps is None else self._fps + self.smoothing * (fps - self._fps)
+
+            if self._fps < self.target_fps * self.down_ratio and self._next(1) is not None:
+                self._above_since = None
+                if self._below_since is None:
+                    self._below_since = now
+                if now - self._below_since >= self.down_seconds:
+                    return self._step(1)
+            elif self._fps > self.target_fps * self.up_ratio and self._next(-1) is not None:
+                self._below_since = None
+                if self._above_since is None:
+                    self._above_since = now
+                if now - self._above_since >= self.up_seconds:
+                    return self._step(-1)
+            else:
+                self._below_since = self._above_since = None
+            return False
+
+    def describe(self):
+        with self._lock:
+            self._settle()
+            return dict(self.levels[self._index], level=self._index, target_fps=self.target_fps,
+                        fps=round(self._fps, 1) if self._fps is not None else None)
+
+    def _available(self, index):
+        return self.levels[index]['model_complexity'] not in self.unavailable
+
+    def _next(self, direction):
+        """Index of the next usable level in direction (1: cheaper, -1: better), or None"""
+        index = self._index + direction
+        while 0 <= index < len(self.levels):
+            if self._available(index):
+                return index
+            index += direction
+        return None
+
+    def _settle(self):
+        # The current model failed to load: move to the nearest usable level, cheaper first
+        if self._available(self._index):
+            return
+        for distance in range(1, len(self.levels)):
+            for index in (self._index + distance, self._index - distance):
+                if 0 <= index < len(self.levels) and self._available(index):
+                    self._index = index
+                    self._below_since = self._above_since = None
+                    print(f"Quality level -> {self.levels[index]['name']} (model unavailable)")
+                    return
+
+    def _step(self, direction):
+        self._index = self._next(direction)
+        self.changes += 1
+        self._below_since = self._above_since = None
+        level = self.levels[self._index]
+        print(f"Quality level -> {level['name']} (fps {self._fps:.1f}, target {self.target_fps})")
+        return True
@@ -0,0 +1,93 @@
+import threading
+import time
+
+
+class _Flight:
+    """A load in progress that other callers of the same key wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """
+    In-process read-through cache for measurement queries.
+
+    get(key, load) returns the cached value while it is younger than ttl,
+    otherwise it calls load(). Concurrent misses for the same key share one
+    load (single flight): the first caller runs it, the others wait for its
+    result instead of sending the same query to the backend.
+
+    invalidate() drops everything; call it as soon as an insert commits.
+    A load that was already running when the cache was invalidated still
+    returns its result to its callers, but the result is not stored, so the
+    next read sees the new row.
+
+    Args:
+        ttl (float): Seconds a value stays fresh; bounds staleness from writers
+            outside this process
+        max_entries (int): Most keys kept; the oldest go first
+    """
+
+    def __init__(self, ttl=5.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # key -> (expires_at, value), oldest first
+        self._flights = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = load()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                if flight.error is None and generation == self._generation and self.ttl > 0:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def _store(self, key, value):
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = (now + self.ttl, value)
+        # Every entry has the same TTL, so the expired ones are at the front
+        while self._entries:
+            oldest = next(iter(self._entries))
+            if len(self._entries) <= self.max_entries and self._entries[oldest][0] > now:
+                break
+            del self._entries[oldest]
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            # Later callers start a fresh load instead of joining one that may predate the insert
+            self._flights.clear()
@@ -0,0 +1,168 @@
+import threading
+
+import cv2
+import numpy as np
+from flask import request
+
+from frame_pipeline import LatestQueue
+from metrics import FRAME_STAGE_SECONDS, FRAMES_DROPPED
+
+REMOTE_NAMESPACE = '/remote'
+MAX_FRAME_BYTES = 1024 * 1024
+MAX_SOURCE_SIDE = 4096  # Largest camera width/height a browser may report
+
+
+class RemoteClient:
+    """
+    One browser booth that uploads its own webcam frames.
+
+    The newest upload waits in a one-slot queue; a worker thread decodes it,
+    runs process(image, source_size) and emits the returned dict back to the
+    browser. source_size is the (width, height) the browser camera captured
+    at before downscaling, which pixel-based measurements must be taken in.
+    Uploads arriving while the worker is busy replace the waiting frame, so a
+    slow backend drops stale frames instead of falling behind.
+
+    Args:
+        process (callable): Takes a BGR image and source_size, returns a JSON-serialisable dict
+        on_finished (callable, optional): Called once the worker has stopped
+        info (dict, optional): Sent to the browser when the client starts
+    """
+
+    def __init__(self, process, on_finished=None, info=None, name='remote'):
+        self.process = process
+        self.on_finished = on_finished
+        self.info = info or {}
+        self.name = name
+        self.processed = 0
+        self._frames = LatestQueue(1, FRAMES_DROPPED.labels(f"remote_{name}").inc)
+        self._decode_seconds = FRAME_STAGE_SECONDS.labels(f"remote_{name}", 'decode')
+        self._process_seconds = FRAME_STAGE_SECONDS.labels(f"remote_{name}", 'process')
+        self._emit = None
+        self._thread = threading.Thread(target=self._run, name=f"remote-{name}", daemon=True)
+
+    @property
+    def dropped(self):
+        return self._frames.dropped
+
+    def start(self, emit_result):
+        self._emit = emit_result
+        self._thread.start()
+
+    def submit(self, seq, payload, source_size=None):
+        """Queue an uploaded JPEG; returns False once the client is closed"""
+        return self._frames.put((seq, payload, source_size))
+
+    def close(self):
+        self._frames.close()
+
+    def _run(self):
+        try:
+            while True:
+                item = self._frames.get()
+                if item is None:
+                    break
+                seq, payload, source_size = item
+                with self._decode_seconds.time():
+                    image = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    self._emit({'seq': seq, 'error': 'could not decode frame'})
+                    continue
+                h, w = image.shape[:2]
+                try:
+                    with self._process_seconds.time():
+                        result = self.process(image, source_size or (w, h))
+                except Exception as e:
+                    print(f"Error in remote frame processing ({self.name}): {e}")
+                    continue
+                self.processed += 1
+                result.update(seq=seq, size=[w, h], dropped=self.dropped)
+                self._emit(result)
+        finally:
+            if self.on_finished is not None:
+                self.on_finished()
+
+
+class RemoteCaptureHub:
+    """
+    Socket.IO endpoint for booths that capture in the browser.
+
+    Events on the namespace (all answered through the Socket.IO ack):
+        start {session_id, mode}        - attach the socket to a measurement session
+        frame {seq, image, source_size} - one JPEG frame as binary, plus the camera's own size
+        stop                            - detach; also happens on disconnect
+    Results are sent back as 'result' events to the uploading socket only.
+
+    Browsers keep one frame in flight and wait for its result before sending
+    the next, so each booth runs at whatever rate the backend can serve it.
+
+    Args:
+        get_session (callable): Returns the MeasurementSession for a session ID
+        factories (dict): mode -> callable(measurement_session) returning a RemoteClient or None
+    """
+
+    def __init__(self, socketio, get_session, factories, namespace=REMOTE_NAMESPACE):
+        self.socketio = socketio
+        self.get_session = get_session
+        self.factories = factories
+        self.namespace = namespace
+        self._clients = {}
+        self._lock = threading.Lock()
+
+        socketio.on_event('start', self._on_start, namespace=namespace)
+        socketio.on_event('frame', self._on_frame, namespace=namespace)
+        socketio.on_event('stop', self._on_stop, namespace=namespace)
+        socketio.on_event('disconnect', self._on_stop, namespace=namespace)
+
+    @property
+    def active_clients(self):
+        with self._lock:
+            return len(self._clients)
+
+    def stats(self):
+        with self._lock:
+            clients = list(self._clients.values())
+        return {
+            'clients': len(clients),
+            'processed_frames': sum(client.processed for client in clients),
+            'dropped_frames': sum(client.dropped for client in clients),
+        }
+
+    def _on_start(self, data):
+        sid = request.sid
+        self._detach(sid)
+        data = data or {}
+        factory = self.factories.get(data.get('mode'))
+        if factory is None or not data.get('session_id'):
+            return {'ok': False, 'error': 'unknown mode or session'}
+
+        client = factory(self.get_session(data['session_id']))
+        if client is None:
+            return {'ok': False, 'error': 'busy'}
+        with self._lock:
+            self._clients[sid] = client
+        client.start(lambda result: self.socketio.emit('result', result, to=sid, namespace=self.namespace))
+        return dict(client.info, ok=True)
+
+    def _on_frame(self, data):
+        with self._lock:
+            client = self._clients.get(request.sid)
+        image = (data or {}).get('image')
+        if client is None or not isinstance(image, bytes) or len(image) > MAX_FRAME_BYTES:
+            return {'ok': False}
+        source_size = data.get('source_size')
+        if isinstance(source_size, list) and len(source_size) == 2 and all(
+                isinstance(v, int) and 0 < v <= MAX_SOURCE_SIDE for v in source_size):
+            source_size = tuple(source_size)
+        else:
+            source_size = None
+        return {'ok': client.submit(data.get('seq'), image, source_size), 'dropped': client.dropped}
+
+    def _on_stop(self, *args):
+        self._detach(request.sid)
+
+    def _detach(self, sid):
+        with self._lock:
+            client = self._clients.pop(sid, None)
+        if client is not None:
+            client.close()
@@ -0,0 +1,74 @@
+import threading
+
+from flask import request
+from flask_socketio import join_room, leave_room
+
+EVENTS_NAMESPACE = '/events'
+
+
+class SessionEvents:
+    """
+    Pushes measurement progress to the pages of a session over Socket.IO.
+
+    Pages emit 'join' {session_id} on the namespace and from then on receive,
+    in the room of that session only:
+        progress {remaining_time, stability, captured} - whenever one of them changes
+        measurement {id, timestamp, height, ...}       - the stored row, once per capture
+    The session's current progress is sent straight after joining, so a page
+    that connects mid-countdown does not wait for the next change.
+
+    Progress is deduplicated per session (stability in progress_step steps),
+    so the per-frame calls from the annotate thread emit a few events per
+    second at most. The state is dropped once a session stores its
+    measurement or ends (forget).
+
+    Args:
+        get_session (callable): Returns the MeasurementSession for a session ID
+    """
+
+    def __init__(self, socketio, get_session, namespace=EVENTS_NAMESPACE, progress_step=0.05):
+        self.socketio = socketio
+        self.get_session = get_session
+        self.namespace = namespace
+        self.progress_step = progress_step
+        self._last_progress = {}
+        self._lock = threading.Lock()
+
+        socketio.on_event('join', self._on_join, namespace=namespace)
+        socketio.on_event('leave', self._on_leave, namespace=namespace)
+
+    def progress(self, measurement_session):
+        """Emit the session's countdown and stability if they changed since the last emit"""
+        progress = measurement_session.progress()
+        state = (progress['remaining_time'], round(progress['stability'] / self.progress_step),
+                 progress['captured'])
+        with self._lock:
+            if self._last_progress.get(measurement_session.session_id) == state:
+                return
+            self._last_progress[measurement_session.session_id] = state
+        self.socketio.emit('progress', progress, to=measurement_session.session_id, namespace=self.namespace)
+
+    def measurement(self, session_id, row):
+        """Emit the row that was just stored for the session"""
+        # The capture ends this round; whatever progress follows is news again
+        self.forget(session_id)
+        self.socketio.emit('measurement', row, to=session_id, namespace=self.namespace)
+
+    def forget(self, session_id):
+        """Drop the deduplication state of a session that ended"""
+        with self._lock:
+            self._last_progress.pop(session_id, None)
+
+    def _on_join(self, data):
+        session_id = (data or {}).get('session_id')
+        if not session_id:
+            return {'ok': False, 'error': 'missing session'}
+        join_room(session_id, namespace=self.namespace)
+        self.socketio.emit('progress', self.get_session(session_id).progress(), to=request.sid,
+                           namespace=self.namespace)
+        return {'ok': True}
+
+    def _on_leave(self, data):
+        session_id = (data or {}).get('session_id')
+        if session_id:
+            leave_room(session_id, namespace=self.namespace)
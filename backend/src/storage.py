@@ -0,0 +1,329 @@
+import base64
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+UNIX_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    '''
+    CREATE TABLE IF NOT EXISTS measurements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        height REAL,
+        shoulder_width REAL,
+        chest_circumference REAL,
+        waist_circumference REAL
+    )
+    ''',
+    # The index also carries the rowid, so "newest first" is a backwards index scan
+    'CREATE INDEX IF NOT EXISTS idx_measurements_timestamp ON measurements (timestamp)',
+    # Change counter behind the HTTP validators (ETag / Last-Modified); triggers keep it
+    # current for every writer, including other processes such as view_measurements.py
+    'CREATE TABLE IF NOT EXISTS change_log (id INTEGER PRIMARY KEY CHECK (id = 1), '
+    'counter INTEGER NOT NULL, changed_at REAL NOT NULL)',
+    f"INSERT OR IGNORE INTO change_log VALUES (1, 0, {UNIX_NOW})",
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS measurements_{event.lower()}_count AFTER {event} ON measurements
+    BEGIN
+        UPDATE change_log SET counter = counter + 1, changed_at = {UNIX_NOW} WHERE id = 1;
+    END"""
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+MEASUREMENT_FIELDS = ('timestamp', 'height', 'shoulder_width', 'chest_circumference', 'waist_circumference')
+COLUMNS = ('id',) + MEASUREMENT_FIELDS
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(row):
+    """Opaque page cursor for the (timestamp, id) position of row"""
+    raw = json.dumps([row['timestamp'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return str(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def parse_page_args(args):
+    """
+    Turn query-string arguments into keyword arguments for a page() call.
+
+    Accepts limit, before (also cursor), after, since, until (YYYY-MM-DD or
+    full timestamps), min_id, max_id, since_id (only rows newer than that ID),
+    ids (comma separated) and fields (comma separated columns). Raises
+    ValueError on bad input.
+    """
+    limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    options = {'limit': limit}
+    before = args.get('before') or args.get('cursor')
+    if before:
+        options['before'] = decode_cursor(before)
+    if args.get('after'):
+        options['after'] = decode_cursor(args['after'])
+    if args.get('since'):
+        options['since'] = args['since']
+    if args.get('until'):
+        until = args['until']
+        # A bare date includes the whole day
+        options['until'] = until + ' 23:59:59' if len(until) == 10 else until
+    for name in ('min_id', 'max_id'):
+        if args.get(name):
+            options[name] = int(args[name])
+    if args.get('since_id'):
+        # Delta mode for pollers: only the rows added after the last one they have
+        options['min_id'] = max(options.get('min_id', 0), int(args['since_id']) + 1)
+    if args.get('ids'):
+        options['ids'] = [int(v) for v in args['ids'].split(',') if v.strip()]
+    if args.get('fields'):
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        options['fields'] = fields
+    return options
+
+
+def page_result(rows, limit, before=None, after=None, fields=None):
+    """
+    Build the page dict from up to limit + 1 rows fetched in scan order.
+
+    rows are newest first for a forward (before) scan and oldest first for an
+    after scan; the extra row only tells whether another page exists.
+    """
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if after is not None:
+        rows.reverse()
+        has_older, has_newer = True, more
+    else:
+        has_older, has_newer = more, before is not None
+    return {
+        'items': [{f: row[f] for f in fields} if fields else dict(row) for row in rows],
+        'next_cursor': encode_cursor(rows[-1]) if rows and has_older else None,
+        'prev_cursor': encode_cursor(rows[0]) if rows and has_newer else None,
+    }
+
+
+def delta_result(rows, limit, fields=None):
+    """
+    Build the page dict for a since_id poll from up to limit + 1 rows in id order.
+
+    The page holds the oldest new rows, newest first; prev_cursor is set when
+    even newer rows are waiting, and there is nothing older to page to.
+    """
+    more = len(rows) > limit
+    rows = list(rows[:limit])
+    rows.reverse()
+    return {
+        'items': [{f: row[f] for f in fields} if fields else dict(row) for row in rows],
+        'next_cursor': None,
+        'prev_cursor': encode_cursor(rows[0]) if rows and more else None,
+    }
+
+
+def is_delta_query(before=None, after=None, since=None, until=None, min_id=None, max_id=None, ids=None):
+    """True when min_id (since_id) is the only bound, so an id range scan answers the page"""
+    return min_id is not None and all(v is None for v in (before, after, since, until, max_id, ids))
+
+
+PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',  # Safe with WAL; fsync only at checkpoints
+    'PRAGMA cache_size = -8000',  # 8 MB page cache per connection
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA foreign_keys = ON',
+)
+
+
+class MeasurementStore:
+    """
+    SQLite storage for measurements.
+
+    The database runs in WAL mode, so the insert a video thread makes when
+    it captures never blocks API readers, and readers never block it.
+    Connections are pooled: each operation borrows an idle connection (or
+    opens one) and hands it back, which also covers the short-lived request
+    threads of the development server. The schema is migrated once, when the
+    store is created.
+
+    Args:
+        db_path (str): Path of the SQLite file
+        timeout (float): Seconds a writer waits for another writer's lock
+        max_idle (int): Idle connections kept open for reuse
+    """
+
+    def __init__(self, db_path, timeout=5.0, max_idle=8):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self.migrate()
+
+    def connect(self):
+        """Open a new tuned connection; callers that don't use the pool close it themselves"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of the block"""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self.connect()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def migrate(self):
+        """Bring the schema up to date; safe to run on every start"""
+        conn = self.connect()
+        try:
+            # WAL is a property of the file, so it only needs setting once
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('BEGIN IMMEDIATE')
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            for statement in MIGRATIONS[version:]:
+                conn.execute(statement)
+            if version < len(MIGRATIONS):
+                conn.execute(f'PRAGMA user_version = {len(MIGRATIONS)}')
+                print(f"Migrated {self.db_path} to schema version {len(MIGRATIONS)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def insert(self, measurement_data):
+        """Store one measurement and return its ID"""
+        with self.connection() as conn:
+            with conn:
+                cursor = conn.execute(
+                    f'INSERT INTO measurements ({", ".join(MEASUREMENT_FIELDS)}) VALUES (?, ?, ?, ?, ?)',
+                    tuple(measurement_data[field] for field in MEASUREMENT_FIELDS))
+            return cursor.lastrowid
+
+    def all(self):
+        with self.connection() as conn:
+            rows = conn.execute('SELECT * FROM measurements ORDER BY timestamp DESC, id DESC').fetchall()
+        return [dict(row) for row in rows]
+
+    def version(self):
+        """
+        Cheap validator for the measurements table.
+
+        Returns:
+            tuple: (change counter as a string, unix time of the last change)
+        """
+        with self.connection() as conn:
+            counter, changed_at = conn.execute('SELECT counter, changed_at FROM change_log WHERE id = 1').fetchone()
+        return str(counter), changed_at
+
+    def latest(self):
+        with self.connection() as conn:
+            row = conn.execute('SELECT * FROM measurements ORDER BY timestamp DESC, id DESC LIMIT 1').fetchone()
+        return dict(row) if row else None
+
+    def page(self, limit=DEFAULT_PAGE_SIZE, before=None, after=None, since=None, until=None,
+             min_id=None, max_id=None, ids=None, fields=None):
+        """
+        One page of measurements, newest first, using keyset pagination.
+
+        before/after are (timestamp, id) positions from decode_cursor: the page
+        holds the rows just older than before, or just newer than after. Each
+        query walks the timestamp index from the cursor and stops after
+        limit + 1 rows, so its cost does not grow with the table. A min_id
+        with no other bound (a since_id poll) scans the primary key instead.
+
+        Returns:
+            dict: items, next_cursor (older rows) and prev_cursor (newer rows), None at either end
+        """
+        # The cursor needs id and timestamp even when they are not projected
+        columns = list(dict.fromkeys(['id', 'timestamp'] + list(fields))) if fields else ['*']
+        if is_delta_query(before, after, since, until, min_id, max_id, ids):
+            # Pollers asking for rows after the last ID they have: a rowid range scan that
+            # touches only the new rows, instead of walking the timestamp index to filter by id
+            with self.connection() as conn:
+                rows = conn.execute(f'SELECT {", ".join(columns)} FROM measurements WHERE id >= ? ORDER BY id LIMIT ?',
+                                    (min_id, limit + 1)).fetchall()
+            return delta_result(rows, limit, fields)
+
+        where, params = [], []
+        if before is not None:
+            where.append('(timestamp, id) < (?, ?)')
+            params.extend(before)
+        if after is not None:
+            where.append('(timestamp, id) > (?, ?)')
+            params.extend(after)
+        if since is not None:
+            where.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('timestamp <= ?')
+            params.append(until)
+        if min_id is not None:
+            where.append('id >= ?')
+            params.append(min_id)
+        if max_id is not None:
+            where.append('id <= ?')
+            params.append(max_id)
+        if ids is not None:
+            where.append(f'id IN ({", ".join("?" * len(ids))})' if ids else '0')
+            params.extend(ids)
+
+        order = 'ASC' if after is not None else 'DESC'
+        sql = (f'SELECT {", ".join(columns)} FROM measurements'
+               + (f' WHERE {" AND ".join(where)}' if where else '')
+               + f' ORDER BY timestamp {order}, id {order} LIMIT ?')
+        with self.connection() as conn:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        return page_result(rows, limit, before, after, fields)
+
+    def chunks(self, size=1000, since=None, until=None, fields=None):
+        """
+        Yield every matching measurement, newest first, in lists of at most size rows.
+
+        Each chunk is its own short keyset query, so memory stays bounded and no
+        read transaction is held open while the caller writes the rows out.
+        """
+        before = None
+        while True:
+            page = self.page(limit=size, before=before, since=since, until=until, fields=fields)
+            if page['items']:
+                yield page['items']
+            if page['next_cursor'] is None:
+                return
+            before = decode_cursor(page['next_cursor'])
+
+    def close(self):
+        """Close the idle connections; borrowed ones close when they come back"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.max_idle = 0
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import cv2
+
+from metrics import STREAM_ENCODE_SECONDS, STREAM_ENCODED_BYTES
+
+# Faster JPEG backends are optional; OpenCV is the fallback
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG
+    _turbojpeg = TurboJPEG()
+except Exception:
+    _turbojpeg = None
+
+
+def available_backend():
+    if simplejpeg is not None:
+        return 'simplejpeg'
+    if _turbojpeg is not None:
+        return 'turbojpeg'
+    return 'opencv'
+
+
+class StreamEncoder:
+    """
+    JPEG encoder for one video stream, used as the encode stage of a FramePipeline.
+
+    Frames wider than max_width are scaled down (keeping the aspect ratio)
+    into a reused buffer before encoding. Quality and size trade bandwidth
+    against CPU; stats() reports what the current settings cost, and every
+    frame is also recorded in the stream_encode_seconds and
+    stream_encoded_bytes_total metrics.
+
+    Only the scaled frame's buffer is reused. The JPEG backends return a
+    new bytes object per frame, with no way to encode into an existing
+    buffer, and that object is what the subscribers of the stream keep.
+
+    Args:
+        quality (int): JPEG quality 1-100
+        max_width (int): Scale frames down to this width; 0 keeps the input size
+        backend (str, optional): 'simplejpeg', 'turbojpeg' or 'opencv' (default: fastest installed)
+        name (str): Stream label for the metrics
+    """
+
+    def __init__(self, quality=80, max_width=0, backend=None, name='stream'):
+        self.quality = quality
+        self.max_width = max_width
+        self.backend = backend or available_backend()
+        self._encode_metric = STREAM_ENCODE_SECONDS.labels(name, self.backend)
+        self._bytes_metric = STREAM_ENCODED_BYTES.labels(name)
+        self._resize_buffer = None
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._bytes = 0
+        self._encode_seconds = 0.0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._bytes_per_second = 0.0
+
+    def __call__(self, image):
+        return self.encode(image)
+
+    def encode(self, image):
+        """Scale and encode a BGR image; returns JPEG bytes or None on failure"""
+        start = time.perf_counter()
+        image = self._scale(image)
+        try:
+            payload = self._encode(image)
+        except Exception as e:
+            print(f"Error encoding frame with {self.backend}: {e}")
+            return None
+        if payload is None:
+            print("Error: Could not encode frame")
+            return None
+        self._record(len(payload), time.perf_counter() - start)
+        return payload
+
+    def stats(self):
+        with self._lock:
+            bytes_per_second = self._bytes_per_second
+            if not bytes_per_second and self._frames:
+                # No full one-second window yet
+                bytes_per_second = self._window_bytes / max(time.monotonic() - self._window_start, 1e-3)
+            return {
+                'backend': self.backend,
+                'quality': self.quality,
+                'max_width': self.max_width,
+                'frames': self._frames,
+                'bytes': self._bytes,
+                'bytes_per_second': round(bytes_per_second),
+                'avg_frame_bytes': self._bytes // self._frames if self._frames else 0,
+                'avg_encode_ms': round(self._encode_seconds * 1000 / self._frames, 2) if self._frames else 0.0,
+            }
+
+    def _scale(self, image):
+        height, width = image.shape[:2]
+        if not self.max_width or width <= self.max_width:
+            return image
+        size = (self.max_width, int(height * self.max_width / width))
+        buffer = self._resize_buffer
+        if buffer is None or buffer.shape[:2] != (size[1], size[0]) or buffer.shape[2:] != image.shape[2:]:
+            buffer = None
+        # Only the encode thread touches the buffer, and its bytes are copied out by the encoder
+        self._resize_buffer = cv2.resize(image, size, dst=buffer, interpolation=cv2.INTER_AREA)
+        return self._resize_buffer
+
+    def _encode(self, image):
+        if self.backend == 'simplejpeg':
+            return simplejpeg.encode_jpeg(image, quality=self.quality, colorspace='BGR')
+        if self.backend == 'turbojpeg':
+            return _turbojpeg.encode(image, quality=self.quality)
+        ret, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buffer.tobytes() if ret else None
+
+    def _record(self, size, seconds):
+        self._encode_metric.observe(seconds)
+        self._bytes_metric.inc(size)
+        with self._lock:
+            self._frames += 1
+            self._bytes += size
+            self._encode_seconds += seconds
+            self._window_bytes += size
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed >= 1.0:
+                self._bytes_per_second = self._window_bytes / elapsed
+                self._window_start = now
+                self._window_bytes = 0
@@ -0,0 +1,121 @@
+import threading
+
+from flask import request
+
+STREAM_NAMESPACE = '/stream'
+
+
+class SocketViewer:
+    """
+    Sends one StreamSubscriber's frames to one Socket.IO client.
+
+    Each frame waits for the client's acknowledgement before the next one is
+    sent. Frames produced in the meantime replace each other in the
+    subscriber's one-slot queue, so a client that falls behind gets dropped
+    frames rather than a growing buffer.
+    """
+
+    def __init__(self, socketio, sid, subscriber, namespace=STREAM_NAMESPACE, ack_timeout=2.0):
+        self.socketio = socketio
+        self.sid = sid
+        self.subscriber = subscriber
+        self.namespace = namespace
+        self.ack_timeout = ack_timeout
+        self.sent = 0
+        self.ack_timeouts = 0
+        self._thread = threading.Thread(target=self._run, name=f"viewer-{sid}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self.subscriber.close()
+
+    def _run(self):
+        while True:
+            payload = self.subscriber.get(timeout=0.5)
+            if payload is None:
+                if self.subscriber.closed:
+                    break
+                continue
+
+            acked = threading.Event()
+            self.sent += 1
+            frame = {'seq': self.sent, 'image': payload, 'dropped': self.subscriber.dropped}
+            metadata = self.subscriber.stream.pipeline.metadata
+            if metadata is not None:
+                frame['meta'] = metadata()
+            self.socketio.emit('frame', frame, to=self.sid, namespace=self.namespace,
+                               callback=lambda *args: acked.set())
+            if not acked.wait(self.ack_timeout):
+                # Lost ack or a stalled tab - carry on with the newest frame
+                self.ack_timeouts += 1
+
+        self.socketio.emit('end', {}, to=self.sid, namespace=self.namespace)
+
+
+class StreamSocketHub:
+    """
+    Socket.IO endpoint for the processed camera streams.
+
+    Events on the namespace:
+        watch {kind, session_id} - start receiving 'frame' events ({seq, image, dropped, meta})
+        unwatch                  - stop; also happens on disconnect
+    The client acknowledges every 'frame' once it has displayed it. An 'end'
+    event follows the last frame of a stream.
+
+    Socket viewers attach to the same StreamHub streams as the MJPEG routes,
+    so both transports share one pipeline per session.
+
+    Args:
+        get_session (callable): Returns the MeasurementSession for a session ID
+        factories (dict): kind -> callable(measurement_session) returning a FramePipeline or None
+    """
+
+    def __init__(self, socketio, stream_hub, get_session, factories, namespace=STREAM_NAMESPACE, ack_timeout=2.0):
+        self.socketio = socketio
+        self.stream_hub = stream_hub
+        self.get_session = get_session
+        self.factories = factories
+        self.namespace = namespace
+        self.ack_timeout = ack_timeout
+        self._viewers = {}
+        self._lock = threading.Lock()
+
+        socketio.on_event('watch', self._on_watch, namespace=namespace)
+        socketio.on_event('unwatch', self._on_unwatch, namespace=namespace)
+        socketio.on_event('disconnect', self._on_unwatch, namespace=namespace)
+
+    @property
+    def active_viewers(self):
+        with self._lock:
+            return len(self._viewers)
+
+    def _on_watch(self, data):
+        sid = request.sid
+        self._detach(sid)
+        data = data or {}
+        kind, session_id = data.get('kind'), data.get('session_id')
+        factory = self.factories.get(kind)
+        if factory is None or not session_id:
+            return {'ok': False, 'error': 'unknown stream or session'}
+
+        measurement_session = self.get_session(session_id)
+        subscriber = self.stream_hub.subscribe((kind, session_id), lambda: factory(measurement_session))
+        if subscriber is None:
+            return {'ok': False, 'error': 'stream unavailable'}
+
+        viewer = SocketViewer(self.socketio, sid, subscriber, self.namespace, self.ack_timeout)
+        with self._lock:
+            self._viewers[sid] = viewer
+        viewer.start()
+        return {'ok': True}
+
+    def _on_unwatch(self, *args):
+        self._detach(request.sid)
+
+    def _detach(self, sid):
+        with self._lock:
+            viewer = self._viewers.pop(sid, None)
+        if viewer is not None:
+            viewer.close()
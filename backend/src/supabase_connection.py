@@ -1,8 +1,11 @@
+import inspect
 import os
+import threading
 from dotenv import load_dotenv
-from supabase import create_client
 from datetime import datetime
 
+from storage import COLUMNS, DEFAULT_PAGE_SIZE, delta_result, is_delta_query, page_result
+
 # Load environment variables from root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 dotenv_path = os.path.join(BASE_DIR, '.env')
@@ -11,18 +14,91 @@ load_dotenv(dotenv_path)
 # Supabase configuration
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+# "local" swaps in the in-memory stand-in from supabase_local.py (tests, offline runs)
+SUPABASE_BACKEND = os.environ.get('SUPABASE_BACKEND', 'supabase')
+SUPABASE_POOL_SIZE = int(os.environ.get('SUPABASE_POOL_SIZE', 10))  # Kept-alive HTTP connections
+SUPABASE_TIMEOUT = float(os.environ.get('SUPABASE_TIMEOUT', 10))  # Seconds per request
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+if SUPABASE_BACKEND != 'local' and (not SUPABASE_URL or not SUPABASE_KEY):
     raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in the .env file")
 
-# Initialize Supabase client
+# Columns the API returns; client_id is the write-behind queue's bookkeeping, not data
+SELECT_COLUMNS = ','.join(COLUMNS)
+
+# Whether the table has the client_id column (backend/supabase/migrations); probed on first batch insert
+_client_id_supported = None
+
+# One client per process: creating one per call rebuilt the HTTP client and paid TLS setup every time
+_client = None
+_client_lock = threading.Lock()
+
+def _create_client():
+    if SUPABASE_BACKEND == 'local':
+        from supabase_local import LocalSupabaseClient
+        print("Using the in-memory Supabase stand-in")
+        return LocalSupabaseClient()
+
+    from supabase import create_client
+    try:
+        from supabase import ClientOptions
+    except ImportError:
+        return create_client(SUPABASE_URL, SUPABASE_KEY)
+    options = {'postgrest_client_timeout': SUPABASE_TIMEOUT}
+    # Newer supabase-py releases accept the httpx client to use, which lets us size its pool
+    if 'httpx_client' in inspect.signature(ClientOptions).parameters:
+        import httpx
+        options['httpx_client'] = httpx.Client(
+            timeout=SUPABASE_TIMEOUT,
+            limits=httpx.Limits(max_connections=SUPABASE_POOL_SIZE, max_keepalive_connections=SUPABASE_POOL_SIZE))
+    client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(**options))
+    # The PostgREST sub-client is built lazily; build it here, under the lock, not racing in request threads
+    client.postgrest
+    return client
+
 def get_supabase_client():
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    """The process-wide Supabase client, created on first use; safe to share between threads"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
 
 # Database functions - replacements for the SQLite functions in app.py
+def get_measurements_version():
+    """
+    Validator matching MeasurementStore.version, probed from the newest row.
+
+    Every process and the dashboard insert into the same table, so the probe
+    asks Postgres (one indexed row) rather than counting local writes. Only
+    inserts change it; edits and deletes made outside the app do not.
+
+    Returns:
+        tuple: (max ID and its timestamp as the tag, unix time of that timestamp),
+            or None when the probe fails and no validators should be sent
+    """
+    supabase = get_supabase_client()
+    try:
+        response = supabase.table('measurements').select('id,timestamp').order('id', desc=True).limit(1).execute()
+    except Exception as e:
+        print(f"Error probing measurements: {e}")
+        return None
+    if hasattr(response, 'error') and response.error is not None:
+        print(f"Error probing measurements: {response.error}")
+        return None
+    if not response.data:
+        return '0', 0
+    row = response.data[0]
+    try:
+        # Timestamps are written in local time, as datetime.now() gives them
+        changed_at = datetime.fromisoformat(str(row['timestamp']).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+    return f"{row['id']}-{int(changed_at):x}", changed_at
+
 def get_all_measurements():
     supabase = get_supabase_client()
-    response = supabase.table('measurements').select('*').order('timestamp', desc=True).execute()
+    response = supabase.table('measurements').select(SELECT_COLUMNS).order('timestamp', desc=True).execute()
     
     # Check for errors
     if hasattr(response, 'error') and response.error is not None:
@@ -33,7 +109,7 @@ def get_all_measurements():
 
 def get_latest_measurement():
     supabase = get_supabase_client()
-    response = supabase.table('measurements').select('*').order('timestamp', desc=True).limit(1).execute()
+    response = supabase.table('measurements').select(SELECT_COLUMNS).order('timestamp', desc=True).limit(1).execute()
     
     # Check for errors
     if hasattr(response, 'error') and response.error is not None:
@@ -42,6 +118,49 @@ def get_latest_measurement():
     
     return response.data[0] if response.data else None
 
+def get_measurements_page(limit=DEFAULT_PAGE_SIZE, before=None, after=None, since=None, until=None,
+                          min_id=None, max_id=None, ids=None, fields=None):
+    """
+    One page of measurements, newest first, with the same keyset cursors as MeasurementStore.page
+
+    Returns:
+        dict: items, next_cursor and prev_cursor
+    """
+    columns = list(dict.fromkeys(['id', 'timestamp'] + list(fields))) if fields else list(COLUMNS)
+    descending = after is None
+    supabase = get_supabase_client()
+    if is_delta_query(before, after, since, until, min_id, max_id, ids):
+        # since_id polls: walk the primary key from the last ID the poller has
+        response = (supabase.table('measurements').select(','.join(columns)).gte('id', min_id)
+                    .order('id').limit(limit + 1).execute())
+        if hasattr(response, 'error') and response.error is not None:
+            print(f"Error fetching measurements: {response.error}")
+            return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+        return delta_result(response.data, limit, fields)
+    query = supabase.table('measurements').select(','.join(columns))
+    if before is not None:
+        query = query.or_(f'timestamp.lt."{before[0]}",and(timestamp.eq."{before[0]}",id.lt.{before[1]})')
+    if after is not None:
+        query = query.or_(f'timestamp.gt."{after[0]}",and(timestamp.eq."{after[0]}",id.gt.{after[1]})')
+    if since is not None:
+        query = query.gte('timestamp', since)
+    if until is not None:
+        query = query.lte('timestamp', until)
+    if min_id is not None:
+        query = query.gte('id', min_id)
+    if max_id is not None:
+        query = query.lte('id', max_id)
+    if ids is not None:
+        query = query.in_('id', ids)
+    response = query.order('timestamp', desc=descending).order('id', desc=descending).limit(limit + 1).execute()
+    
+    # Check for errors
+    if hasattr(response, 'error') and response.error is not None:
+        print(f"Error fetching measurements: {response.error}")
+        return {'items': [], 'next_cursor': None, 'prev_cursor': None}
+    
+    return page_result(response.data, limit, before, after, fields)
+
 def insert_measurement(measurement_data):
     """
     Insert a new measurement into the Supabase database
@@ -70,11 +189,57 @@ def insert_measurement(measurement_data):
     
     return response.data[0] if response.data else None
 
+def _has_client_id(supabase):
+    """Probe once whether the measurements table has the client_id column"""
+    global _client_id_supported
+    if _client_id_supported is None:
+        try:
+            response = supabase.table('measurements').select('client_id').limit(1).execute()
+            error = getattr(response, 'error', None)
+        except Exception as e:
+            error = e
+        if error is not None and '42703' not in str(getattr(error, 'code', None) or error):
+            # Not the undefined-column error: the backend is unreachable, so ask again on the retry
+            raise RuntimeError(f"Error probing the client_id column: {error}")
+        _client_id_supported = error is None
+        if not _client_id_supported:
+            print("measurements.client_id is missing, so retried batches may be stored twice; "
+                  "apply backend/supabase/migrations/20261018000000_measurements_client_id.sql")
+    return _client_id_supported
+
+def insert_measurements(rows):
+    """
+    Insert several measurements in one request, for the write-behind queue
+
+    Unlike insert_measurement this raises on failure, so the caller can retry.
+    Rows carry a client_id (UUID) and are upserted on it, ignoring rows that
+    are already stored, so a retry after a lost response cannot insert twice.
+    Tables without the client_id column (the migration in
+    backend/supabase/migrations was not applied) get a plain insert instead.
+
+    Args:
+        rows (list): Measurement dicts as for insert_measurement, plus client_id
+
+    Returns:
+        list: The records that were new
+    """
+    supabase = get_supabase_client()
+    if _has_client_id(supabase):
+        query = supabase.table('measurements').upsert(rows, on_conflict='client_id', ignore_duplicates=True)
+    else:
+        query = supabase.table('measurements').insert(
+            [{k: v for k, v in row.items() if k != 'client_id'} for row in rows])
+    response = query.execute()
+    
+    if hasattr(response, 'error') and response.error is not None:
+        raise RuntimeError(f"Error inserting measurements: {response.error}")
+    
+    return response.data
+
 # You can add more functions as needed, such as:
 # - delete_measurement(id)
 # - update_measurement(id, data)
 # - get_measurement_by_id(id)
-# - get_measurements_by_date_range(start_date, end_date)
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+"""
+In-memory stand-in for the Supabase client, for tests and offline runs.
+
+Implements the part of the supabase-py query builder that
+supabase_connection.py uses (select, insert, upsert, order, limit,
+eq/gt/gte/lt/lte, in_, or_ and execute), so SUPABASE_BACKEND=local runs app_supabase.py
+without a network or a Supabase project.
+"""
+import itertools
+import re
+import threading
+
+_OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+}
+
+
+class LocalResponse:
+    def __init__(self, data):
+        self.data = data
+        self.error = None
+
+
+def _coerce(value, sample):
+    # PostgREST filter values arrive as text; compare them as the column's type
+    value = value.strip('"')
+    if isinstance(sample, float) or (isinstance(sample, int) and '.' in value):
+        return float(value)
+    if isinstance(sample, int):
+        return int(value)
+    return value
+
+
+def _split_top_level(text):
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    parts.append(current)
+    return parts
+
+
+def _parse_condition(text):
+    """Parse one PostgREST logical-filter term, e.g. 'id.lt.5' or 'and(a.eq.1,b.gt.2)'"""
+    match = re.fullmatch(r'(and|or)\((.*)\)', text)
+    if match:
+        terms = [_parse_condition(part) for part in _split_top_level(match.group(2))]
+        combine = all if match.group(1) == 'and' else any
+        return lambda row: combine(term(row) for term in terms)
+    column, op, value = text.split('.', 2)
+    compare = _OPERATORS[op]
+    return lambda row: row.get(column) is not None and compare(row[column], _coerce(value, row[column]))
+
+
+class LocalQuery:
+    def __init__(self, table, action, payload=None, columns='*', on_conflict=None):
+        self.table = table
+        self.action = action
+        self.payload = payload
+        self.columns = columns
+        self.on_conflict = on_conflict
+        self._filters = []
+        self._order = []
+        self._limit = None
+
+    def _filter(self, column, op, value):
+        compare = _OPERATORS[op]
+        self._filters.append(lambda row: row.get(column) is not None and compare(row[column], value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, 'eq', value)
+
+    def gt(self, column, value):
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._filter(column, 'lte', value)
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def or_(self, filters):
+        self._filters.append(_parse_condition(f'or({filters})'))
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def execute(self):
+        if self.action == 'insert':
+            return LocalResponse(self.table.insert(self.payload))
+        if self.action == 'upsert':
+            return LocalResponse(self.table.insert(self.payload, unique=self.on_conflict))
+        rows = [row for row in self.table.rows() if all(f(row) for f in self._filters)]
+        # Stable sorts applied last key first give the combined ordering
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        if self.columns != '*':
+            columns = [c.strip() for c in self.columns.split(',')]
+            rows = [{c: row.get(c) for c in columns} for row in rows]
+        return LocalResponse(rows)
+
+
+class LocalTable:
+    def __init__(self):
+        self._rows = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def rows(self):
+        with self._lock:
+            return [dict(row) for row in self._rows]
+
+    def insert(self, data, unique=None):
+        """Insert records; with unique set, skip those whose value of that column already exists"""
+        records = data if isinstance(data, list) else [data]
+        inserted = []
+        with self._lock:
+            for record in records:
+                if unique and any(row.get(unique) == record.get(unique) for row in self._rows):
+                    continue
+                row = dict(record, id=next(self._ids))
+                self._rows.append(row)
+                inserted.append(dict(row))
+        return inserted
+
+
+class LocalTableRef:
+    """What client.table(name) returns: the start of a select, insert or upsert query"""
+
+    def __init__(self, table):
+        self._table = table
+
+    def select(self, columns='*'):
+        return LocalQuery(self._table, 'select', columns=columns)
+
+    def insert(self, data):
+        return LocalQuery(self._table, 'insert', payload=data)
+
+    def upsert(self, data, on_conflict=None, ignore_duplicates=False):
+        # Only the ignore_duplicates form is used: rows already stored are left as they are
+        return LocalQuery(self._table, 'upsert', payload=data, on_conflict=on_conflict)
+
+
+class LocalSupabaseClient:
+    """Thread-safe, in-memory client with the supabase-py table() interface"""
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        with self._lock:
+            table = self._tables.setdefault(name, LocalTable())
+        return LocalTableRef(table)
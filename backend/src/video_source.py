@@ -0,0 +1,245 @@
+import os
+import time
+from urllib.parse import parse_qs
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+class VideoSource:
+    """
+    Base class for frame sources. Mirrors the parts of cv2.VideoCapture the
+    loops use (read, isOpened, get, release), so any source can stand in for
+    a webcam.
+
+    With realtime=True, read() paces frames at the source's fps; with
+    realtime=False frames come as fast as the caller asks for them, which is
+    what throughput tests and offline reprocessing want.
+    """
+
+    def __init__(self, fps=30.0, realtime=True, loop=False):
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.frames_read = 0
+        self.resolution = (0, 0)
+        self._next_frame_at = None
+
+    def read(self):
+        frame = self._read_frame()
+        if frame is None and self.loop and self.frames_read:
+            self._rewind()
+            frame = self._read_frame()
+        if frame is None:
+            return False, None
+        self._pace()
+        self.frames_read += 1
+        return True, frame
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.resolution[0]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.resolution[1]
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def release(self):
+        pass
+
+    def _pace(self):
+        if not self.realtime or not self.fps:
+            return
+        now = time.monotonic()
+        if self._next_frame_at is None or now - self._next_frame_at > 1.0:
+            # First frame, or the caller stalled for a while - don't burst to catch up
+            self._next_frame_at = now
+        elif self._next_frame_at > now:
+            time.sleep(self._next_frame_at - now)
+        self._next_frame_at += 1.0 / self.fps
+
+    def _read_frame(self):
+        raise NotImplementedError
+
+    def _rewind(self):
+        pass
+
+
+class WebcamSource(VideoSource):
+    """A camera by device index. The driver paces frames, so realtime is not applied."""
+
+    def __init__(self, index=0):
+        super().__init__(realtime=False)
+        self.index = index
+        self._capture = cv2.VideoCapture(index)
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.resolution = (int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def isOpened(self):
+        return self._capture.isOpened()
+
+    def release(self):
+        self._capture.release()
+
+    def _read_frame(self):
+        success, frame = self._capture.read()
+        return frame if success else None
+
+    def __repr__(self):
+        return f"camera {self.index}"
+
+
+class VideoFileSource(VideoSource):
+    """A video file, played at its own frame rate (realtime) or as fast as it decodes."""
+
+    def __init__(self, path, realtime=True, loop=False):
+        super().__init__(realtime=realtime, loop=loop)
+        self.path = path
+        self._capture = cv2.VideoCapture(path)
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.resolution = (int(self._capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self._capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def isOpened(self):
+        return self._capture.isOpened()
+
+    def release(self):
+        self._capture.release()
+
+    def _read_frame(self):
+        success, frame = self._capture.read()
+        return frame if success else None
+
+    def _rewind(self):
+        self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def __repr__(self):
+        return f"video {self.path}"
+
+
+class ImageDirectorySource(VideoSource):
+    """The images of a directory in name order, one per frame."""
+
+    def __init__(self, path, fps=15.0, realtime=True, loop=False):
+        super().__init__(fps=fps, realtime=realtime, loop=loop)
+        self.path = path
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+        self._position = 0
+        if self.files:
+            first = cv2.imread(self.files[0])
+            if first is not None:
+                self.resolution = (first.shape[1], first.shape[0])
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def _read_frame(self):
+        while self._position < len(self.files):
+            frame = cv2.imread(self.files[self._position])
+            self._position += 1
+            if frame is not None:
+                return frame
+            print(f"Skipping unreadable image {self.files[self._position - 1]}")
+        return None
+
+    def _rewind(self):
+        self._position = 0
+
+    def __repr__(self):
+        return f"images {self.path}"
+
+
+class SyntheticSource(VideoSource):
+    """
+    Generated frames, for headless load tests.
+
+    Without an image the frames are a moving test pattern; with one, the
+    image sways and zooms slightly so detectors and trackers see motion.
+    frames=0 means the source never ends.
+    """
+
+    def __init__(self, size=(1280, 720), fps=30.0, realtime=True, frames=0, image=None, period=24):
+        super().__init__(fps=fps, realtime=realtime)
+        self.size = tuple(size)
+        self.frames = frames
+        self.period = period
+        self.resolution = self.size
+        self.image = None
+        if image is not None:
+            loaded = cv2.imread(image) if isinstance(image, str) else image
+            if loaded is None:
+                raise ValueError(f"Could not read synthetic source image {image}")
+            self.image = cv2.resize(loaded, self.size)
+        self._index = 0
+
+    def _read_frame(self):
+        if self.frames and self._index >= self.frames:
+            return None
+        frame = self.render(self._index)
+        self._index += 1
+        return frame
+
+    def render(self, index):
+        phase = 2 * np.pi * index / self.period
+        width, height = self.size
+        if self.image is None:
+            frame = np.full((height, width, 3), 64, np.uint8)
+            center = (int(width / 2 + width / 4 * np.sin(phase)), int(height / 2 + height / 4 * np.cos(phase)))
+            cv2.circle(frame, center, max(8, min(width, height) // 10), (0, 200, 255), -1)
+            cv2.putText(frame, str(index), (20, 40), cv2.FONT_HERSHEY_PLAIN, 2, (255, 255, 255), 2)
+            return frame
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), 0, 1.0 + 0.03 * np.sin(phase))
+        matrix[0, 2] += 20 * np.sin(phase)
+        matrix[1, 2] += 8 * np.cos(phase)
+        return cv2.warpAffine(self.image, matrix, self.size, borderMode=cv2.BORDER_REPLICATE)
+
+    def __repr__(self):
+        return f"synthetic {self.size[0]}x{self.size[1]}"
+
+
+def open_source(spec=0):
+    """
+    Open a video source from a spec string (e.g. a CAMERA_SOURCE setting).
+
+    Specs:
+        0, "1"                          - webcam by index
+        "clip.mp4"                      - video file
+        "captures/"                     - image directory
+        "synthetic"                     - generated test pattern
+    Options follow a '?', e.g. "clip.mp4?speed=max&loop=1",
+    "captures/?fps=5" or "synthetic?size=640x480&image=person.png&frames=300".
+        speed   realtime (default) or max
+        loop    1 to restart a file or directory at the end
+        fps     frame rate for directories and synthetic sources
+        size    WIDTHxHEIGHT of synthetic frames
+        image   picture a synthetic source animates
+        frames  number of synthetic frames (default: endless)
+
+    Returns:
+        VideoSource
+    """
+    if isinstance(spec, int):
+        return WebcamSource(spec)
+    spec = str(spec).strip()
+    target, _, query = spec.partition('?')
+    options = {key: values[-1] for key, values in parse_qs(query).items()}
+    realtime = options.get('speed', 'realtime') != 'max'
+    loop = options.get('loop') in ('1', 'true', 'yes')
+
+    if target.isdigit():
+        return WebcamSource(int(target))
+    if target == 'synthetic':
+        size = tuple(int(v) for v in options.get('size', '1280x720').lower().split('x'))
+        return SyntheticSource(size=size, fps=float(options.get('fps', 30)), realtime=realtime,
+                               frames=int(options.get('frames', 0)), image=options.get('image'))
+    if os.path.isdir(target):
+        return ImageDirectorySource(target, fps=float(options.get('fps', 15)), realtime=realtime, loop=loop)
+    return VideoFileSource(target, realtime=realtime, loop=loop)
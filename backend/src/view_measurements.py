@@ -1,61 +1,190 @@
+"""
+Lihat, ekspor dan hapus data pengukuran di measurements.db.
+
+Tanpa argumen menampilkan menu interaktif. Ekspor langsung dari command line:
+    python view_measurements.py export hasil.csv
+    python view_measurements.py export hasil.csv.gz --since 2025-01-01 --until 2025-01-31
+    python view_measurements.py export hasil.parquet --columns timestamp,height,waist_circumference
+"""
+import argparse
+import csv
+import gzip
+import math
 import sqlite3
-import pandas as pd
 from tabulate import tabulate
 import os
 
-def connect_db():
-    db_path = 'measurements.db'
-    if not os.path.exists(db_path):
+from storage import COLUMNS, MeasurementStore, parse_page_args
+
+DB_PATH = 'measurements.db'
+CHUNK_SIZE = 5000  # Rows read per query; bounds memory however large the table is
+STAT_FIELDS = ('height', 'shoulder_width', 'chest_circumference', 'waist_circumference')
+
+def open_store():
+    if not os.path.exists(DB_PATH):
         print("Database belum ada. Silakan lakukan pengukuran terlebih dahulu.")
         return None
-    return sqlite3.connect(db_path)
+    return MeasurementStore(DB_PATH)
+
+def connect_db():
+    store = open_store()
+    return store.connect() if store else None
+
+class RunningStats:
+    """count/mean/std/min/max of one column without keeping its values (Welford)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan')
 
 def view_all_measurements():
-    conn = connect_db()
-    if conn is None:
+    store = open_store()
+    if store is None:
         return
     
     try:
-        # Membaca data menggunakan pandas
-        query = "SELECT * FROM measurements ORDER BY timestamp DESC"
-        df = pd.read_sql_query(query, conn)
+        # Dibaca per chunk, jadi memori tetap kecil walau tabelnya besar
+        stats = {field: RunningStats() for field in STAT_FIELDS}
+        total = 0
+        for rows in store.chunks(CHUNK_SIZE):
+            if total == 0:
+                print("\nData Pengukuran:")
+            print(tabulate(rows, headers='keys', tablefmt='psql'))
+            total += len(rows)
+            for row in rows:
+                for field in STAT_FIELDS:
+                    stats[field].add(row[field])
         
-        if df.empty:
+        if total == 0:
             print("\nBelum ada data pengukuran dalam database.")
         else:
-            print("\nData Pengukuran:")
-            print(tabulate(df, headers='keys', tablefmt='psql', showindex=False))
-            
             # Menampilkan statistik dasar
             print("\nStatistik Pengukuran:")
-            stats = df[['height', 'shoulder_width', 'chest_circumference', 'waist_circumference']].describe()
-            print(tabulate(stats, headers='keys', tablefmt='psql', floatfmt='.2f'))
+            table = [[name] + [getattr(stats[field], name) if name != 'std' else stats[field].std()
+                               for field in STAT_FIELDS]
+                     for name in ('count', 'mean', 'std', 'min', 'max')]
+            print(tabulate(table, headers=STAT_FIELDS, tablefmt='psql', floatfmt='.2f'))
     
     except sqlite3.Error as e:
         print(f"Error saat membaca database: {e}")
     
     finally:
-        conn.close()
+        store.close()
 
-def export_to_csv():
-    conn = connect_db()
-    if conn is None:
-        return
+class CsvExportWriter:
+    def __init__(self, path, columns, compress=False):
+        self.file = gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=columns)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+class ParquetExportWriter:
+    """Writes each chunk as its own row group"""
+
+    TYPES = {'id': 'int64', 'timestamp': 'string'}
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Ekspor Parquet membutuhkan pyarrow: pip install -r requirements-parquet.txt")
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(c, getattr(pa, self.TYPES.get(c, 'float64'))()) for c in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        arrays = {c: [row[c] for row in rows] for c in self.columns}
+        self.writer.write_table(self.pa.Table.from_pydict(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+def export_format(path):
+    if path.endswith('.parquet'):
+        return 'parquet'
+    if path.endswith('.gz'):
+        return 'csv.gz'
+    return 'csv'
+
+def export_measurements(filename, output_format=None, since=None, until=None, columns=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream measurements into a CSV, gzip-compressed CSV or Parquet file.
+
+    Args:
+        filename (str): Output path; the format follows its extension unless output_format is given
+        output_format (str): 'csv', 'csv.gz' or 'parquet'
+        since, until (str): Date range (YYYY-MM-DD or full timestamps), both inclusive
+        columns (str): Comma separated columns to export (default: all)
+        chunk_size (int): Rows held in memory at a time
+
+    Returns:
+        int: Number of rows exported, or None on error
+    """
+    try:
+        # Same validation as the web API: unknown columns and bare end dates
+        options = parse_page_args({'since': since, 'until': until, 'fields': columns})
+    except ValueError as e:
+        print(f"Error: {e}")
+        return None
+    options.pop('limit')
+    fields = options.pop('fields', None) or list(COLUMNS)
+    
+    store = open_store()
+    if store is None:
+        return None
     
+    output_format = output_format or export_format(filename)
     try:
-        df = pd.read_sql_query("SELECT * FROM measurements", conn)
-        if not df.empty:
-            filename = 'measurement_history.csv'
-            df.to_csv(filename, index=False)
-            print(f"\nData berhasil diekspor ke {filename}")
+        if output_format == 'parquet':
+            writer = ParquetExportWriter(filename, fields)
         else:
-            print("\nTidak ada data untuk diekspor")
+            writer = CsvExportWriter(filename, fields, compress=output_format == 'csv.gz')
+    except (RuntimeError, OSError) as e:
+        # pyarrow missing, or the output path cannot be written
+        print(f"Error: {e}")
+        store.close()
+        return None
     
-    except sqlite3.Error as e:
+    total = 0
+    try:
+        for rows in store.chunks(chunk_size, fields=fields, **options):
+            writer.write([{f: row[f] for f in fields} for row in rows])
+            total += len(rows)
+    except (sqlite3.Error, OSError) as e:
         print(f"Error saat mengekspor data: {e}")
-    
+        return None
     finally:
-        conn.close()
+        writer.close()
+        store.close()
+    
+    print(f"\n{total} baris berhasil diekspor ke {filename}")
+    return total
+
+def export_to_csv(filename='measurement_history.csv'):
+    return export_measurements(filename)
 
 def delete_measurement(measurement_id):
     conn = connect_db()
@@ -78,7 +207,7 @@ def delete_measurement(measurement_id):
     finally:
         conn.close()
 
-def main():
+def menu():
     while True:
         print("\nMenu Pengukuran Badan:")
         print("1. Lihat semua data pengukuran")
@@ -92,7 +221,8 @@ def main():
             view_all_measurements()
         
         elif choice == '2':
-            export_to_csv()
+            filename = input("Nama file (.csv, .csv.gz atau .parquet) [measurement_history.csv]: ").strip()
+            export_measurements(filename or 'measurement_history.csv')
         
         elif choice == '3':
             measurement_id = input("Masukkan ID pengukuran yang akan dihapus: ")
@@ -108,5 +238,28 @@ def main():
         else:
             print("\nPilihan tidak valid")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lihat dan ekspor data pengukuran (tanpa argumen: menu interaktif)")
+    subparsers = parser.add_subparsers(dest='command')
+    export = subparsers.add_parser('export', help="Ekspor ke CSV, CSV terkompresi (.gz) atau Parquet")
+    export.add_argument('output', help="File tujuan (.csv, .csv.gz atau .parquet)")
+    export.add_argument('--format', choices=['csv', 'csv.gz', 'parquet'], help="Abaikan format dari ekstensi file")
+    export.add_argument('--since', help="Tanggal awal (YYYY-MM-DD)")
+    export.add_argument('--until', help="Tanggal akhir, ikut dihitung (YYYY-MM-DD)")
+    export.add_argument('--columns', help=f"Kolom yang diekspor, dipisah koma ({','.join(COLUMNS)})")
+    export.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Baris per chunk")
+    subparsers.add_parser('list', help="Tampilkan semua data dan statistik")
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        total = export_measurements(args.output, args.format, args.since, args.until, args.columns,
+                                    max(1, args.chunk_size))
+        return 0 if total is not None else 1
+    if args.command == 'list':
+        view_all_measurements()
+        return 0
+    menu()
+    return 0
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    raise SystemExit(main()) 
\ No newline at end of file
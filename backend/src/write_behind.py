@@ -0,0 +1,200 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from storage import PRAGMAS
+
+
+class WriteBehindQueue:
+    """
+    Background writer for measurement inserts to a remote backend.
+
+    put() hands a row to a bounded in-memory queue and returns at once; the
+    frame loop never waits on the network. A writer thread moves queued rows
+    into a local SQLite spool, then sends the oldest spooled rows in batches
+    through write_batch and deletes them once it returns. When write_batch
+    raises, the batch stays spooled and is retried with exponential backoff,
+    so rows survive an unreachable backend as well as a restart: whatever is
+    left in the spool is replayed when the next process starts.
+
+    If the in-memory queue is full, put() spools the row itself - a local
+    SQLite insert, still no network I/O.
+
+    put() gives each row a client_id (UUID) that is spooled with it, so
+    write_batch can upsert on it and a batch retried after a lost response
+    is not stored twice.
+
+    Several processes may share one spool file. A writer claims the rows it
+    sends by marking them with its own ID and only takes rows that are
+    unclaimed or whose claim is older than claim_timeout (their writer died).
+
+    Nothing is opened until start() or the first put(), so a process that
+    imports the app without serving it (the reloader's parent) leaves the
+    spool alone.
+
+    Args:
+        write_batch (callable): Stores a list of rows remotely; raises on failure
+        spool_path (str): Path of the SQLite spool file
+        maxsize (int): Rows held in memory before put() spools directly
+        batch_size (int): Most rows per write_batch call
+        max_delay (float): Seconds to wait for more rows to fill a batch
+        base_backoff (float): Seconds before the first retry; doubles per failure
+        max_backoff (float): Longest wait between retries
+        claim_timeout (float): Seconds after which another writer's claim is taken over
+    """
+
+    def __init__(self, write_batch, spool_path, maxsize=1000, batch_size=50, max_delay=0.5,
+                 base_backoff=1.0, max_backoff=60.0, claim_timeout=60.0):
+        self.write_batch = write_batch
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self.failures = 0
+        self._owner = uuid.uuid4().hex
+        self._queue = queue.Queue(maxsize)
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._spool = None
+        self._spooled = 0
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Open the spool and start the writer thread, which replays what earlier runs left"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            spool = sqlite3.connect(self.spool_path, timeout=5.0, check_same_thread=False)
+            spool.execute('PRAGMA journal_mode = WAL')
+            for pragma in PRAGMAS:
+                spool.execute(pragma)
+            with spool:
+                spool.execute('CREATE TABLE IF NOT EXISTS pending (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                              'payload TEXT NOT NULL, queued_at REAL NOT NULL, claimed_by TEXT, claimed_at REAL)')
+                # Spools written before rows were claimed lack the claim columns
+                columns = {row[1] for row in spool.execute('PRAGMA table_info(pending)')}
+                if 'claimed_by' not in columns:
+                    spool.execute('ALTER TABLE pending ADD COLUMN claimed_by TEXT')
+                    spool.execute('ALTER TABLE pending ADD COLUMN claimed_at REAL')
+            self._spool = spool
+            self._spooled = spool.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+            if self._spooled:
+                print(f"Replaying {self._spooled} spooled measurement(s) from {self.spool_path}")
+
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def put(self, row):
+        """Queue one row for the backend; never blocks on the network"""
+        self.start()
+        row = dict(row)
+        row.setdefault('client_id', str(uuid.uuid4()))
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._spool_rows([row])
+
+    def pending(self):
+        """Rows not yet confirmed by the backend (queued in memory or spooled)"""
+        return self._queue.qsize() + self._spooled
+
+    def close(self, timeout=5.0):
+        """Stop the writer; rows it has not sent stay in the spool for the next start"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            with self._spool_lock:
+                # Hand unsent rows back at once instead of after claim_timeout
+                with self._spool:
+                    self._spool.execute('UPDATE pending SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ?',
+                                        (self._owner,))
+                self._spool.close()
+
+    def _spool_rows(self, rows):
+        now = time.time()
+        with self._spool_lock:
+            with self._spool:
+                self._spool.executemany('INSERT INTO pending (payload, queued_at) VALUES (?, ?)',
+                                        [(json.dumps(row), now) for row in rows])
+            self._spooled += len(rows)
+
+    def _collect(self, wait):
+        # The first row may take up to wait seconds; the rest of a batch only max_delay
+        try:
+            rows = [self._queue.get(timeout=wait)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_delay
+        while len(rows) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _send_batch(self):
+        now = time.time()
+        with self._spool_lock:
+            with self._spool:
+                # One UPDATE claims the batch atomically, so two writers never take the same rows
+                self._spool.execute(
+                    'UPDATE pending SET claimed_by = ?, claimed_at = ? WHERE id IN ('
+                    'SELECT id FROM pending WHERE claimed_by IS NULL OR claimed_by = ? OR claimed_at < ? '
+                    'ORDER BY id LIMIT ?)',
+                    (self._owner, now, self._owner, now - self.claim_timeout, self.batch_size))
+            batch = self._spool.execute('SELECT id, payload FROM pending WHERE claimed_by = ? ORDER BY id',
+                                        (self._owner,)).fetchall()
+            if not batch:
+                # What is left belongs to live writers in other processes; look again later
+                self._spooled = self._spool.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+                self._retry_at = time.monotonic() + 1.0
+                return
+        try:
+            self.write_batch([json.loads(payload) for _, payload in batch])
+        except Exception as e:
+            self.failures += 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (self.failures - 1))
+            self._retry_at = time.monotonic() + delay
+            print(f"Error writing {len(batch)} measurement(s), retrying in {delay:.1f}s: {e}")
+            return
+        self.failures = 0
+        with self._spool_lock:
+            with self._spool:
+                self._spool.execute(f'DELETE FROM pending WHERE id IN ({", ".join("?" * len(batch))})',
+                                    [row_id for row_id, _ in batch])
+            # Counted again, since other processes add to and drain the same spool
+            self._spooled = self._spool.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Wake at least once a second so close() is noticed
+            wait = 1.0
+            if self._spooled:
+                wait = min(wait, max(self._retry_at - time.monotonic(), 0.0))
+            rows = self._collect(wait)
+            if rows:
+                self._spool_rows(rows)
+            if self._spooled and time.monotonic() >= self._retry_at:
+                self._send_batch()
+
+        # Keep what is still in memory for the next start
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if rows:
+            self._spool_rows(rows)
@@ -0,0 +1,5 @@
+-- Idempotency key for the write-behind queue of app_supabase.py: batches are
+-- upserted on client_id, so a batch retried after a lost response is not stored twice.
+-- Rows inserted before this migration keep a NULL client_id (NULLs never conflict).
+ALTER TABLE measurements ADD COLUMN IF NOT EXISTS client_id uuid;
+CREATE UNIQUE INDEX IF NOT EXISTS measurements_client_id_key ON measurements (client_id);